@@ -0,0 +1,13 @@
+"""Trufflehog3 performance benchmarks.
+
+Benchmarks are run against synthetic repositories generated on the fly,
+so that no network access is required. Results are saved as JSON and can be
+compared between versions
+
+```bash
+$ python -m benchmarks run --output old.json
+$ git checkout new-version
+$ python -m benchmarks run --output new.json
+$ python -m benchmarks compare old.json new.json
+```
+"""
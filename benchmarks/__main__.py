@@ -0,0 +1,68 @@
+"""Run trufflehog3 benchmarks.
+
+```bash
+$ python -m benchmarks --help
+```
+"""
+
+import argparse
+import json as jsonlib
+import sys
+
+from benchmarks.generate import Params, generate
+from benchmarks.run import compare, load, run, save
+
+
+def main() -> int:
+    """Run benchmarks CLI."""
+    defaults = Params()
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark trufflehog3 on synthetic repositories",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    knobs = argparse.ArgumentParser(add_help=False)
+    for field in Params.__attrs_attrs__:
+        knobs.add_argument(
+            f"--{field.name}",
+            type=field.type,
+            default=getattr(defaults, field.name),
+            help="default: %(default)s",
+        )
+
+    cmd = commands.add_parser("run", parents=[knobs], help="run benchmarks")
+    cmd.add_argument("-o", "--output", help="path to JSON results file")
+    cmd.add_argument("-n", "--repeat", type=int, default=3)
+
+    cmd = commands.add_parser(
+        "generate", parents=[knobs], help="generate synthetic repository"
+    )
+    cmd.add_argument("path", help="path to generate repository at")
+
+    cmd = commands.add_parser("compare", help="compare two results files")
+    cmd.add_argument("old")
+    cmd.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        print(compare(load(args.old), load(args.new)))
+        return 0
+
+    params = Params(
+        **{f.name: getattr(args, f.name) for f in Params.__attrs_attrs__}
+    )
+    if args.command == "generate":
+        generate(args.path, params)
+    else:
+        results = run(params, args.repeat)
+        if args.output:
+            save(results, args.output)
+        else:
+            print(jsonlib.dumps(results, indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
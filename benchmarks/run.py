@@ -0,0 +1,181 @@
+"""Benchmark runner for trufflehog3 pipeline stages."""
+
+import attr
+import json as jsonlib
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from trufflehog3 import __VERSION__, DEFAULT_RULES_FILE
+from trufflehog3 import engine, render
+from trufflehog3.core import load_rules
+from trufflehog3.models import Pattern
+from trufflehog3.search import search
+from trufflehog3.source import dirlist, gitlist
+
+from benchmarks.generate import Params, generate
+
+# stage function returns number of processed items and bytes
+Stage = Callable[[], Tuple[int, int]]
+
+
+def run(params: Params = Params(), repeat: int = 3) -> Dict[str, Any]:
+    """Run all benchmarks against synthetic repository and return results."""
+    with TemporaryDirectory(prefix="trufflehog3-bench-") as tmp:
+        generate(tmp, params)
+        results = {
+            name: measure(stage, repeat)
+            for name, stage in stages(tmp, params).items()
+        }
+
+    return {
+        "version": __VERSION__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": attr.asdict(params),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def stages(path: str, params: Params) -> Dict[str, Stage]:
+    """Return benchmarked stages for the given repository."""
+    rules = load_rules(DEFAULT_RULES_FILE)
+    files = dirlist(path)
+    diffs = gitlist(path, depth=params.commits) if params.commits else []
+    units = files + diffs
+    issues = [i for f in units for i in search(f, rules)]
+
+    def _diriter():
+        return len(dirlist(path)), 0
+
+    def _gititer():
+        if not params.commits:
+            return 0, 0
+        found = gitlist(path, depth=params.commits)
+        return len(found), sum(len(f.read()) for f in found)
+
+    def _search(rules: Iterable = rules) -> Tuple[int, int]:
+        size = 0
+        for f in units:
+            size += len(f.read())
+            search(f, rules)
+        return len(units), size
+
+    def _engine(name: str) -> Stage:
+        evolved = [
+            attr.evolve(r, engine=name) if isinstance(r, Pattern) else r
+            for r in rules
+        ]
+        return lambda: _search(evolved)
+
+    def _render(f: Callable[[Iterable], str]) -> Stage:
+        return lambda: (len(issues), len(f(issues)))
+
+    def _load_rules():
+        return len(load_rules(DEFAULT_RULES_FILE)), 0
+
+    def _startup(*args: str) -> Stage:
+        # output must not get mixed into results printed to stdout
+        return lambda: (
+            subprocess.run(
+                [sys.executable, *args],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            ).returncode,
+            0,
+        )
+
+    engines = {
+        f"search.{name}": _engine(name)
+        for name in engine.ENGINES
+        if engine.available(name)
+    }
+    return {
+        "diriter": _diriter,
+        "gititer": _gititer,
+        "search": _search,
+        **engines,
+        "render.text": _render(render.text),
+        "render.json": _render(render.json),
+        "render.html": _render(render.html),
+        "load_rules": _load_rules,
+        "import.cli": _startup("-c", "import trufflehog3.cli"),
+        "cli.version": _startup("-m", "trufflehog3", "--version"),
+    }
+
+
+def measure(stage: Stage, repeat: int = 3) -> Dict[str, float]:
+    """Run stage several times and return timing and throughput stats.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> stats = measure(lambda: (10, 100), repeat=2)
+    >>> stats["items"], stats["bytes"]
+    (10, 100)
+
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items, size = stage()
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings) or float("inf")
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+        "items": items,
+        "bytes": size,
+        "items_per_sec": items / best,
+        "bytes_per_sec": size / best,
+    }
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> str:
+    """Return table comparing median timings of two benchmark results.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> old = {"version": "1", "results": {"search": {"median": 2.0}}}
+    >>> new = {"version": "2", "results": {"search": {"median": 1.0}}}
+    >>> print(compare(old, new))
+    stage                         1          2   change
+    search                   2.0000     1.0000    -50.0%
+
+    """
+    rows = [
+        f"{'stage':<20} {old['version']:>10} {new['version']:>10}   change"
+    ]
+    for name, stats in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before = old["results"][name]["median"]
+        after = stats["median"]
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append(
+            f"{name:<20} {before:>10.4f} {after:>10.4f} {change:>+8.1f}%"
+        )
+
+    return "\n".join(rows)
+
+
+def save(results: Dict[str, Any], file: str):
+    """Save benchmark results as JSON."""
+    Path(file).write_text(jsonlib.dumps(results, indent=2))
+
+
+def load(file: str) -> Dict[str, Any]:
+    """Load benchmark results from JSON."""
+    return jsonlib.loads(Path(file).read_text())
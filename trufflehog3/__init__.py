@@ -1,6 +1,7 @@
 """Main trufflehog3 module."""
 
 import logging
+import os
 import re
 
 from pathlib import Path
@@ -19,6 +20,12 @@ DEFAULT_RULES_FILE = STATIC_DIR / "rules.yml"
 DEFAULT_CONFIG_FILE = f".{__NAME__}.yml"
 DEFAULT_EXCLUDE_SET = {DEFAULT_CONFIG_FILE, ".git"}
 
+CACHE_DIR = Path(
+    os.environ.get(f"{__NAME__.upper()}_CACHE_DIR")
+    or Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / __NAME__
+)
+
 # Inline 'nosecret' comment implementation taken from semgrep:
 # https://github.com/returntocorp/semgrep/blob/master/semgrep/semgrep/constants.py
 NOSECRET_INLINE_RE = re.compile(
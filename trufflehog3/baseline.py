@@ -0,0 +1,146 @@
+"""Compact issue fingerprint baselines for incremental scans.
+
+Baseline file is a fixed-size header followed by a sorted array of 16-byte
+issue IDs, which allows to check for known issues with binary search over
+memory-mapped file without loading and parsing the whole previous report.
+
+"""
+
+import bisect
+import json as jsonlib
+import mmap
+import struct
+import sys
+import uuid
+
+from pathlib import Path
+from typing import Iterable, List, Union
+
+MAGIC = b"TH3BL001"
+HEADER = struct.Struct(f"<{len(MAGIC)}sQ")
+ID_SIZE = 16
+
+
+class Baseline:
+    """Baseline is a read-only set of issue IDs backed by memory-mapped file.
+
+    Note
+    ----
+    Baseline is pickled by its path, so that it can be cheaply passed to
+    worker processes, each of which maps the same file on its own.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> import tempfile
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> path = Path(tmp.name) / "baseline.bin"
+    >>> ids = [uuid.uuid4() for _ in range(3)]
+    >>> dump(ids, path)
+    >>> baseline = Baseline(path)
+    >>> len(baseline)
+    3
+    >>> all(id in baseline for id in ids)
+    True
+    >>> uuid.uuid4() in baseline
+    False
+    >>> baseline.close()
+    >>> tmp.cleanup()
+
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Map baseline file into memory."""
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._size = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:  # pragma: no cover
+            self.close()
+            raise ValueError(f"not a baseline file: '{self.path}'")
+
+    def __len__(self) -> int:
+        """Return number of issue IDs in baseline."""
+        return self._size
+
+    def __getitem__(self, i: int) -> bytes:
+        """Return raw issue ID by its index."""
+        offset = HEADER.size + i * ID_SIZE
+        return self._mmap[offset : offset + ID_SIZE]
+
+    def __contains__(self, id: uuid.UUID) -> bool:
+        """Check whether issue ID is present in baseline."""
+        key = id.bytes
+        i = bisect.bisect_left(self, key)
+        return i < self._size and self[i] == key
+
+    def __reduce__(self):
+        """Pickle baseline by its path."""
+        return (Baseline, (self.path,))
+
+    def close(self):
+        """Unmap baseline file."""
+        self._mmap.close()
+
+
+def isbaseline(file: Union[str, Path]) -> bool:
+    """Check whether file is a baseline file.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> isbaseline("tests/data/test_load.yml")
+    False
+
+    """
+    with open(file, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def dump(ids: Iterable[uuid.UUID], file: Union[str, Path] = None):
+    """Dump issue IDs to baseline file.
+
+    Note
+    ----
+    File defaults to `sys.stdout`.
+
+    """
+    raw = dumps(ids)
+    if file:
+        Path(file).write_bytes(raw)
+    else:  # pragma: no cover
+        sys.stdout.buffer.write(raw)
+
+
+def dumps(ids: Iterable[uuid.UUID]) -> bytes:
+    """Dump issue IDs to baseline bytes.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> raw = dumps([uuid.UUID(int=2), uuid.UUID(int=1), uuid.UUID(int=2)])
+    >>> raw[:8]
+    b'TH3BL001'
+    >>> len(raw)
+    48
+
+    """
+    keys = sorted(set(id.bytes for id in ids))
+    return HEADER.pack(MAGIC, len(keys)) + b"".join(keys)
+
+
+def fromreport(file: Union[str, Path]) -> List[uuid.UUID]:
+    """Load issue IDs from JSON report.
+
+    Note
+    ----
+    Only `id` field is read, issues are not instantiated.
+
+    """
+    return [
+        uuid.UUID(item["id"]) for item in jsonlib.loads(Path(file).read_text())
+    ]
@@ -0,0 +1,168 @@
+"""On-disk cache for parsed and validated models.
+
+Note
+----
+Cache entries are pickled, thus cache directory must not be writable by
+other users. It is created with owner-only permissions by default.
+
+Default cache is disabled if `TRUFFLEHOG3_NO_CACHE` environment variable is
+set. Its size and age are bounded, see `prune`.
+
+"""
+
+import functools
+import hashlib
+import os
+import pickle
+import sys
+import time
+
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from trufflehog3 import __NAME__, __VERSION__, CACHE_DIR
+from trufflehog3 import log, models
+
+NO_CACHE_ENV = f"{__NAME__.upper()}_NO_CACHE"
+CACHE_MAX_SIZE = 256 << 20
+CACHE_MAX_AGE = 30 * 24 * 3600
+
+
+def enabled() -> bool:
+    """Check whether default cache is enabled."""
+    return not os.environ.get(NO_CACHE_ENV)
+
+
+def key(*parts: Union[str, bytes]) -> str:
+    """Return cache key for the given parts.
+
+    Note
+    ----
+    Package version, Python version and models source stamp are always mixed
+    in, so that stale entries are never loaded after upgrades.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> key("rules", "content") == key("rules", "content")
+    True
+    >>> key("rules", "content") == key("rules", "other")
+    False
+
+    """
+    h = hashlib.sha256()
+    for part in (__VERSION__, sys.version, _stamp(), *parts):
+        data = part if isinstance(part, bytes) else part.encode()
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+
+    return h.hexdigest()
+
+
+def get(key: str, directory: Union[str, Path] = None) -> Optional[Any]:
+    """Return cached value or None if it is missing or cannot be loaded.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> import tempfile
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> get("nosuchkey", tmp.name) is None
+    True
+    >>> put("somekey", [1, 2], tmp.name)
+    >>> get("somekey", tmp.name)
+    [1, 2]
+    >>> tmp.cleanup()
+
+    """
+    if directory is None and not enabled():
+        return None
+
+    path = Path(directory or CACHE_DIR) / key
+    try:
+        with path.open("rb") as f:
+            value = pickle.load(f)
+        # modification time is used as last access time for pruning
+        os.utime(path)
+        return value
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # pragma: no cover
+        log.debug(f"ignoring cache entry '{path}': {e}")
+        return None
+
+
+def put(key: str, value: Any, directory: Union[str, Path] = None):
+    """Save value to cache, errors are logged and ignored."""
+    if directory is None and not enabled():
+        return
+
+    directory = Path(directory or CACHE_DIR)
+    path = directory / key
+    tmp = directory / f".{key}.{os.getpid()}"
+    try:
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with tmp.open("wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+    except Exception as e:  # pragma: no cover
+        log.debug(f"skipping cache entry '{path}': {e}")
+        tmp.unlink(missing_ok=True)
+
+
+def prune(
+    directory: Union[str, Path] = None,
+    max_size: int = CACHE_MAX_SIZE,
+    max_age: float = CACHE_MAX_AGE,
+):
+    """Remove entries unused for `max_age` seconds and least recently used
+    ones, until total size of the rest fits `max_size` bytes.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> import tempfile
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> for k in ("k1", "k2", "k3"):
+    ...     put(k, "x" * 100, tmp.name)
+    >>> os.utime(Path(tmp.name) / "k1", (0, 0))
+    >>> prune(tmp.name, max_size=200)
+    >>> sorted(os.listdir(tmp.name))
+    ['k3']
+    >>> tmp.cleanup()
+
+    """
+    if directory is None and not enabled():
+        return
+
+    entries = []
+    try:
+        with os.scandir(directory or CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError as e:  # pragma: no cover
+        log.debug(f"skipping cache pruning: {e}")
+        return
+
+    # most recently used first
+    entries.sort(reverse=True)
+    deadline = time.time() - max_age
+    total = 0
+    for mtime, size, path in entries:
+        total += size
+        if mtime < deadline or total > max_size:
+            try:
+                os.unlink(path)
+            except OSError:  # pragma: no cover
+                pass
+
+
+@functools.lru_cache(maxsize=None)
+def _stamp() -> str:
+    """Return models source stamp, checked once per process."""
+    return str(os.stat(models.__file__).st_mtime_ns)
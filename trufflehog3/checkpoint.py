@@ -0,0 +1,130 @@
+"""Checkpoints for resuming interrupted scans.
+
+Progress is saved as the number of work units, i.e. files and diffs,
+completed in walk order together with the issues found so far. Files of
+current tree are walked in sorted order and Git history is read in
+topological order, so the same units come in the same order on resume.
+Rolling digest of the completed units is saved as well, and resuming fails
+if the target has changed since the checkpoint.
+
+"""
+
+import hashlib
+import time
+
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator, List, Union
+
+from trufflehog3 import cache, log
+from trufflehog3.models import File, Issue
+
+CHECKPOINT_INTERVAL = 30.0
+
+
+class Checkpoint:
+    """Checkpoint tracks completed units and periodically saves them.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> import tempfile
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> files = [File(f"{i}.py", content="x") for i in range(3)]
+    >>> checkpoint = Checkpoint(tmp.name, "scan")
+    >>> for f in checkpoint.units(files[:2]):
+    ...     checkpoint.complete([])
+    >>> checkpoint.save()
+    >>> resumed = Checkpoint(tmp.name, "scan")
+    >>> resumed.resume()
+    True
+    >>> [f.path for f in resumed.units(files)]
+    ['2.py']
+    >>> [f.path for f in Checkpoint(tmp.name, "scan").units(files)]
+    ['0.py', '1.py', '2.py']
+    >>> resumed.clear()
+    >>> Checkpoint(tmp.name, "scan").resume()
+    False
+    >>> tmp.cleanup()
+
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        key: str,
+        interval: float = CHECKPOINT_INTERVAL,
+    ):
+        """Create empty checkpoint, see `Checkpoint.resume` to load it."""
+        self.directory = Path(directory)
+        self.key = key
+        self.interval = interval
+        self.done = 0
+        self.issues: List[Issue] = []
+        self._skip = 0
+        self._expected = None
+        self._digest = hashlib.sha256()
+        self._pending = deque()
+        self._saved = time.monotonic()
+
+    def resume(self) -> bool:
+        """Load last saved state, return false if there is none."""
+        state = cache.get(self.key, self.directory)
+        if state is None:
+            log.info("no checkpoint found, starting from scratch")
+            return False
+
+        self._skip, digest, self.issues = state
+        self._expected = digest
+        log.info(f"resuming after {self._skip} units")
+        return True
+
+    def units(self, files: Iterable[File]) -> Iterator[File]:
+        """Skip units completed before resume and track the rest.
+
+        Note
+        ----
+        Units must be reported completed with `Checkpoint.complete` in the
+        same order they were yielded.
+
+        """
+        it = iter(files)
+        if self._skip:
+            for file in it:
+                self._update(file)
+                if self.done == self._skip:
+                    break
+
+            if self._digest.hexdigest() != self._expected:
+                raise ValueError(
+                    "target has changed since checkpoint, "
+                    "remove it to start from scratch"
+                )
+
+        for file in it:
+            self._pending.append(file)
+            yield file
+
+    def complete(self, issues: Iterable[Issue]):
+        """Mark the oldest pending unit completed with its new issues."""
+        self._update(self._pending.popleft())
+        self.issues.extend(issues)
+        if time.monotonic() - self._saved >= self.interval:
+            self.save()
+
+    def save(self):
+        """Save completed units and issues found so far."""
+        state = (self.done, self._digest.hexdigest(), self.issues)
+        cache.put(self.key, state, self.directory)
+        self._saved = time.monotonic()
+        log.debug(f"checkpoint saved after {self.done} units")
+
+    def clear(self):
+        """Remove saved state once the scan is finished."""
+        (self.directory / self.key).unlink(missing_ok=True)
+
+    def _update(self, file: File):
+        unit = f"{file.commit or ''}:{file.path}:{file.offset}"
+        self._digest.update(unit.encode() + b"\0")
+        self.done += 1
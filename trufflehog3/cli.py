@@ -2,30 +2,45 @@
 """Trufflehog3 CLI."""
 
 import argparse
-import git
+import attr
+import json as jsonlib
 import logging
-import multiprocessing
 import os
 import sys
+import time
 
 from pathlib import Path
 from signal import signal, SIGINT
 from tempfile import TemporaryDirectory
-from typing import Callable
+from typing import Callable, Tuple
 from urllib.parse import urlparse
 
 from trufflehog3 import __NAME__, __VERSION__
 from trufflehog3 import DEFAULT_RULES_FILE
 from trufflehog3 import log
-
-from trufflehog3.core import diff, load, load_config, load_rules, render, scan
+from trufflehog3 import baseline, cache, engine, helper, redos
+from trufflehog3.checkpoint import Checkpoint
+
+from trufflehog3.core import (
+    diff,
+    failed,
+    load,
+    load_config,
+    load_rules,
+    render,
+    scan,
+    write,
+)
 from trufflehog3.models import (
     Config,
     Exclude,
     Format,
     Issue,
+    Pattern,
     Severity,
 )
+from trufflehog3.source import STREAM_PATH, STREAM_TARGET
+from trufflehog3.stats import Coverage, Metrics, Profile
 
 MORE = f"""
 learn more:
@@ -35,17 +50,39 @@ version:
   {__VERSION__}
 """
 
-try:
-    CPU_COUNT = multiprocessing.cpu_count()
-except NotImplementedError:  # pragma: no cover
-    CPU_COUNT = 1
+CPU_COUNT = os.cpu_count() or 1
+
+daemon = helper.lazy("trufflehog3.daemon")
+git = helper.lazy("git")
 
 
 def run(**kwargs):
-    """Run CLI."""
+    r"""Run CLI.
+
+    Note
+    ----
+    Heavy dependencies are only imported on the code paths that need them.
+
+    Examples
+    --------
+    Importing CLI does not import heavy dependencies
+
+    >>> import subprocess
+    >>> heavy = {"git", "jinja2", "yaml", "multiprocessing"}
+    >>> code = f"import sys, {__name__}; print({heavy} & set(sys.modules))"
+    >>> subprocess.run(
+    ...     [sys.executable, "-c", code], capture_output=True, text=True
+    ... ).stdout
+    'set()\n'
+
+    """
     args = _get_cmdline_args(**kwargs)
     log.setLevel(logging.ERROR - args.verbose * 10)
 
+    if args.no_cache:  # pragma: no cover
+        # environment is inherited by worker processes
+        os.environ[cache.NO_CACHE_ENV] = "1"
+
     if args.version:  # pragma: no cover
         print(__VERSION__)
         return 0
@@ -57,14 +94,94 @@ def run(**kwargs):
         render(issues, format=Format.HTML, file=args.output)
         return 0
 
+    if args.merge:  # pragma: no cover
+        issues = {}
+        for f in args.targets:
+            for issue in load(Issue, f):
+                issues.setdefault(issue.id, issue)
+        render(issues.values(), format=args.format, file=args.output)
+        return 0 if args.zero else 2 if issues else 0
+
+    if args.make_baseline:  # pragma: no cover
+        ids = []
+        for f in args.targets:
+            ids.extend(baseline.fromreport(f))
+        baseline.dump(ids, file=args.output)
+        return 0
+
+    if args.check_rules:  # pragma: no cover
+        rules = load_rules(args.rules, args.severity)
+        if args.engine and not engine.available(args.engine):
+            sys.stderr.write(f"{args.engine} is not installed, using re\n")
+        elif args.engine:
+            patterns = [r for r in rules if isinstance(r, Pattern)]
+            bad = engine.incompatible(
+                (r.pattern for r in patterns), args.engine
+            )
+            for r in patterns:
+                if r.pattern in bad:
+                    sys.stderr.write(
+                        f"{r.id}: not supported by {args.engine}, using re\n"
+                    )
+            rules = [attr.evolve(r, engine=args.engine) for r in patterns]
+        reports = redos.check(r for r in rules if isinstance(r, Pattern))
+        if args.format == Format.JSON:
+            raw = jsonlib.dumps([r.asdict() for r in reports], indent=2)
+        else:
+            raw = redos.text(reports)
+        write(raw + "\n", file=args.output)
+        return 0 if all(r.ok for r in reports) else 2
+
     kw = {k: v for k, v in args.__dict__.items() if hasattr(Config(), k) and v}
+    if args.serve:  # pragma: no cover
+        daemon.serve(
+            args.serve,
+            rules=args.rules,
+            config=args.config,
+            processes=args.processes,
+            **kw,
+        )
+        return 0
+
+    if args.daemon:  # pragma: no cover
+        payload = {
+            "paths": [
+                os.path.abspath(t) for t in args.targets if t != STREAM_TARGET
+            ],
+            "options": kw,
+        }
+        if STREAM_TARGET in args.targets:
+            sys.stdin.reconfigure(errors="replace")
+            payload["content"] = [
+                {"path": STREAM_PATH, "content": sys.stdin.read()}
+            ]
+        if args.incremental and baseline.isbaseline(args.incremental):
+            payload["baseline"] = os.path.abspath(args.incremental)
+        issues = list(daemon.request(args.daemon, payload))
+        if args.incremental and "baseline" not in payload:
+            issues = diff(load(Issue, args.incremental), issues, only_new=True)
+        render(issues, format=args.format, file=args.output)
+        return 0 if args.zero else 2 if issues else 0
+
     if args.config:  # pragma: no cover
         config = load_config(args.config, **kw)
 
+    deadline = None
+    if args.time_budget is not None:  # pragma: no cover
+        deadline = time.monotonic() + args.time_budget
+
     rules = load_rules(args.rules, args.severity)
+    profile = Profile() if args.profile_rules else None
+    metrics = Metrics() if args.metrics else None
+    coverages = []
     issues = []
 
+    known = None
+    if args.incremental and baseline.isbaseline(args.incremental):
+        known = baseline.Baseline(args.incremental)
+
     for target in args.targets:
+        name = target
         remote = urlparse(target).scheme in ("http", "https")
         if remote:  # pragma: no cover
             tmp = TemporaryDirectory(prefix=f"{__NAME__}-")
@@ -72,18 +189,81 @@ def run(**kwargs):
             target = tmp.name
 
         if not args.config:
-            config = load_config(target, **kw)
-
-        issues.extend(scan(target, config, rules, args.processes))
+            # file targets, e.g. archives, are not configs themselves
+            where = target
+            if not os.path.isdir(target):
+                where = os.path.dirname(target) or os.curdir
+            config = load_config(where, **kw)
+
+        checkpoint = None
+        if args.checkpoint:  # pragma: no cover
+            key = cache.key(
+                "checkpoint",
+                name if remote else os.path.abspath(target),
+                repr(config),
+                repr(rules),
+                str(args.incremental),
+            )
+            checkpoint = Checkpoint(args.checkpoint, key)
+            if args.resume:
+                checkpoint.resume()
+
+        coverage = None
+        if args.coverage or deadline is not None:  # pragma: no cover
+            coverage = Coverage(name)
+            coverages.append(coverage)
+
+        # staged changes are small, worker pool startup would dominate
+        processes = args.processes or (1 if config.staged else CPU_COUNT)
+        issues.extend(
+            scan(
+                target,
+                config,
+                rules,
+                processes,
+                known,
+                profile,
+                metrics,
+                checkpoint=checkpoint,
+                deadline=deadline,
+                coverage=coverage,
+            )
+        )
 
         if remote:  # pragma: no cover
             tmp.cleanup()
 
-    if args.incremental:  # pragma: no cover
+        if any(failed(i, config) for i in issues):  # pragma: no cover
+            break
+
+    if args.incremental and known is None:  # pragma: no cover
         issues = diff(load(Issue, args.incremental), issues, only_new=True)
 
+    start = time.perf_counter()
     render(issues, format=args.format, file=args.output)
-    return 0 if args.zero else 2 if issues else 0
+
+    if metrics is not None:  # pragma: no cover
+        metrics.render += time.perf_counter() - start
+        prom = args.metrics.suffix == ".prom"
+        write(metrics.prometheus() if prom else metrics.json(), args.metrics)
+
+    if args.coverage:  # pragma: no cover
+        raw = jsonlib.dumps([c.asdict() for c in coverages], indent=2)
+        write(raw + "\n", args.coverage)
+
+    if profile is not None:  # pragma: no cover
+        stats = (
+            profile.json() if args.format == Format.JSON else profile.text()
+        )
+        sys.stderr.write(stats + "\n")
+
+    cache.prune()
+    if args.zero:
+        return 0
+    if issues:
+        return 2
+    # partial scan without issues must not pass for a clean one
+    return 0 if all(c.complete for c in coverages) else 3
 
 
 class _HelpFormatter(argparse.RawTextHelpFormatter):  # pragma: no cover
@@ -123,6 +303,48 @@ def _exclude(s: str) -> Exclude:
     return Exclude(message=s, pattern=pattern, paths=paths.split(","))
 
 
+def _severity(s: str) -> Severity:
+    """Convert string to severity, case-insensitive.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> print(_severity("high"))
+    HIGH
+    >>> _severity(".")
+    Traceback (most recent call last):
+    ...
+    argparse.ArgumentTypeError: invalid severity: '.'
+
+    """
+    try:
+        return Severity(s)
+    except KeyError:
+        raise argparse.ArgumentTypeError(f"invalid severity: {s!r}")
+
+
+def _shard(s: str) -> Tuple[int, int]:
+    """Convert `i/N` string to shard index and count.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> _shard("2/4")
+    (2, 4)
+    >>> _shard("5/4")
+    Traceback (most recent call last):
+    ...
+    ValueError: shard index must be within 1..4
+
+    """
+    index, count = (int(x) for x in s.split("/"))
+    if not 1 <= index <= count:
+        raise ValueError(f"shard index must be within 1..{count}")
+    return index, count
+
+
 def _file(mode: str = "r") -> Callable[[str], Path]:  # pragma: no cover
     def validate(filepath: str) -> Path:
         path = Path(filepath)
@@ -189,7 +411,7 @@ def _get_cmdline_args(**defaults) -> argparse.Namespace:
     parser.add_argument(
         "-i",
         "--incremental",
-        help="path to previous scan",
+        help="path to previous scan or baseline",
         dest="incremental",
         metavar="file",
         type=_file("r"),
@@ -197,11 +419,62 @@ def _get_cmdline_args(**defaults) -> argparse.Namespace:
     parser.add_argument(
         "-p",
         "--processes",
-        help="number of subprocesses to run (%(default)s)",
+        help=f"number of subprocesses to run ({CPU_COUNT}, 1 if staged)",
         dest="processes",
         metavar="int",
         type=int,
-        default=CPU_COUNT,
+    )
+    parser.add_argument(
+        "--daemon",
+        help="send scan request to daemon listening on socket",
+        dest="daemon",
+        metavar="socket",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="path to metrics file, Prometheus textfile if ends with .prom",
+        dest="metrics",
+        metavar="file",
+        type=_file("w"),
+    )
+    parser.add_argument(
+        "--time-budget",
+        help="stop searching after given time and report partial results",
+        dest="time_budget",
+        metavar="seconds",
+        type=float,
+    )
+    parser.add_argument(
+        "--coverage",
+        help="path to file listing searched paths and commits as JSON",
+        dest="coverage",
+        metavar="file",
+        type=_file("w"),
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="path to directory for saving scan progress",
+        dest="checkpoint",
+        metavar="dir",
+        type=Path,
+    )
+    parser.add_argument(
+        "--resume",
+        help="resume scan from the last checkpoint",
+        dest="resume",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--no-cache",
+        help="disable on-disk cache of rules, configs and findings",
+        dest="no_cache",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile-rules",
+        help="print per-rule profiling stats to stderr",
+        dest="profile_rules",
+        action="store_true",
     )
     search = parser.add_argument_group("search arguments")
     search.add_argument(
@@ -219,7 +492,7 @@ def _get_cmdline_args(**defaults) -> argparse.Namespace:
         help="minimum severity filter (%(default)s)",
         dest="severity",
         metavar="str",
-        type=Severity,
+        type=_severity,
         choices=[Severity.LOW, Severity.MEDIUM, Severity.HIGH],
         default=Severity.LOW,
     )
@@ -229,6 +502,35 @@ def _get_cmdline_args(**defaults) -> argparse.Namespace:
         dest="ignore_nosecret",
         action="store_true",
     )
+    search.add_argument(
+        "--engine",
+        help="regular expression engine, falls back to re (re)",
+        dest="engine",
+        metavar="str",
+        choices=engine.ENGINES,
+    )
+    search.add_argument(
+        "--fail-fast",
+        help="stop on first issue found",
+        dest="fail_fast",
+        action="store_const",
+        const=Severity.LOW,
+    )
+    search.add_argument(
+        "--fail-fast-severity",
+        help="stop on first issue of at least given severity",
+        dest="fail_fast_severity",
+        metavar="str",
+        type=_severity,
+        choices=[Severity.LOW, Severity.MEDIUM, Severity.HIGH],
+    )
+    search.add_argument(
+        "--max-issues",
+        help="max issues per rule per file or diff part, the rest are counted",
+        dest="max_issues",
+        metavar="int",
+        type=int,
+    )
     mgroup = search.add_mutually_exclusive_group()
     mgroup.add_argument(
         "--no-entropy",
@@ -263,6 +565,19 @@ def _get_cmdline_args(**defaults) -> argparse.Namespace:
         help="scan from the given commit hash",
         dest="since",
     )
+    source.add_argument(
+        "--shard",
+        help="only scan the i-th of N deterministic shards, e.g. 1/4",
+        dest="shard",
+        metavar="i/N",
+        type=_shard,
+    )
+    source.add_argument(
+        "--archives",
+        help="search inside archives found in target directories",
+        dest="archives",
+        action="store_true",
+    )
     mgroup = source.add_mutually_exclusive_group()
     mgroup.add_argument(
         "--no-current",
@@ -276,6 +591,12 @@ def _get_cmdline_args(**defaults) -> argparse.Namespace:
         dest="no_history",
         action="store_true",
     )
+    mgroup.add_argument(
+        "--staged",
+        help="only check lines added in staged changes",
+        dest="staged",
+        action="store_true",
+    )
     render = parser.add_argument_group("render arguments")
     render.add_argument(
         "-f",
@@ -304,6 +625,31 @@ def _get_cmdline_args(**defaults) -> argparse.Namespace:
         dest="render_html",
         action="store_true",
     )
+    others.add_argument(
+        "--merge",
+        help="merge JSON reports, e.g. of shards, and render them",
+        dest="merge",
+        action="store_true",
+    )
+    others.add_argument(
+        "-B",
+        "--make-baseline",
+        help="convert JSON reports to baseline",
+        dest="make_baseline",
+        action="store_true",
+    )
+    others.add_argument(
+        "--check-rules",
+        help="check rules against adversarial inputs",
+        dest="check_rules",
+        action="store_true",
+    )
+    others.add_argument(
+        "--serve",
+        help="run scan daemon listening on socket",
+        dest="serve",
+        metavar="socket",
+    )
     others.add_argument(
         "-V",
         "--version",
@@ -311,7 +657,15 @@ def _get_cmdline_args(**defaults) -> argparse.Namespace:
         action="store_true",
     )
     parser.set_defaults(**defaults)
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:  # pragma: no cover
+        parser.error("--resume requires --checkpoint")
+    if args.fail_fast_severity:
+        args.fail_fast = args.fail_fast_severity
+    if args.make_baseline and args.targets == [os.curdir]:
+        # default target is a directory, not a report
+        parser.error("--make-baseline requires JSON report paths")
+    return args
 
 
 def _exit_on_keyboard_interrupt(*args, **kwargs):  # pragma: no cover
@@ -1,20 +1,39 @@
 """Core trufflehog3 logic."""
 
 import attr
-import multiprocessing
+import os
+import re
 import sys
-import yaml
+import time
+import uuid
 
+from collections import deque
+from contextlib import closing, contextmanager, nullcontext
 from functools import partial
 from itertools import chain
 from pathlib import Path
-from typing import Iterable, List, Union
+from typing import (
+    Any,
+    Callable,
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 from trufflehog3 import DEFAULT_CONFIG_FILE, DEFAULT_RULES_FILE
-from trufflehog3 import log
+from trufflehog3 import cache, helper, log, redos
+from trufflehog3.baseline import Baseline
+from trufflehog3.checkpoint import Checkpoint
 from trufflehog3.models import (
     Config,
     Entropy,
+    File,
     Format,
     Issue,
     Model,
@@ -23,8 +42,36 @@ from trufflehog3.models import (
     Severity,
 )
 from trufflehog3.render import text, json, html
-from trufflehog3.search import search
-from trufflehog3.source import diriter, gititer
+from trufflehog3.search import RuleIndex, search
+from trufflehog3.source import STREAM_TARGET
+from trufflehog3.source import (
+    archiveiter,
+    diriter,
+    gitblobs,
+    gititer,
+    isarchive,
+    shardof,
+    stagediter,
+    streamiter,
+)
+from trufflehog3.stats import Coverage, Metrics, Profile
+
+multiprocessing = helper.lazy("multiprocessing")
+yaml = helper.lazy("yaml")
+
+CPU_COUNT = os.cpu_count() or 1
+
+# findings of unchanged Git blobs by blob ID and path
+Findings = Dict[Tuple[str, str], List[Issue]]
+
+BATCH_FILES = 64
+BATCH_SIZE = 1 << 20
+
+# file names searched first in fail-fast mode
+LIKELY_RE = re.compile(
+    r"(?i)(secret|credential|passw|token|\.env|config|settings|id_[dr]sa"
+    r"|\.(pem|key|p12|pfx|ppk|jks|keystore|properties|ini|cfg|conf|tfvars)$)"
+)
 
 
 def scan(
@@ -32,8 +79,148 @@ def scan(
     config: Config,
     rules: Iterable[Union[Entropy, Pattern]],
     processes: int,
+    baseline: Baseline = None,
+    profile: Profile = None,
+    metrics: Metrics = None,
+    pool: "multiprocessing.pool.Pool" = None,
+    checkpoint: Checkpoint = None,
+    deadline: float = None,
+    coverage: Coverage = None,
 ) -> Iterable[Issue]:
-    """Return issues found during target path scan."""
+    """Return issues found during target path scan.
+
+    Note
+    ----
+    Issues already present in `baseline` are dropped by worker processes.
+
+    If `profile` is set, per-rule stats from all workers are merged into it.
+    If `metrics` is set, stage metrics from all workers are merged into it.
+
+    If `pool` is set, it is used instead of creating a new one.
+    If `processes` is 1, files are searched in the current process.
+
+    Target `-` stands for `sys.stdin`, which is scanned in chunks.
+
+    If `config.fail_fast` is set, scan stops on the first issue of at least
+    that severity, terminating worker pool and source enumeration.
+
+    If `checkpoint` is set, progress is saved to it periodically and once
+    the scan is interrupted. Checkpoint is cleared only after the scan has
+    finished, i.e. neither failed fast nor ran out of time.
+
+    If `deadline` is set, target is walked and no more files are passed on
+    for searching until `time.monotonic` reaches it, files already passed on
+    are still searched. Searched paths and commits are recorded in `coverage`
+    if it is set, which is marked incomplete on any early stop.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> import tempfile
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> config = Config(no_history=True)
+    >>> rule = Pattern(id="test", message="Test", pattern="Test")
+    >>> checkpoint = Checkpoint(tmp.name, "scan")
+    >>> issues = scan("tests", config, [rule], 1, checkpoint=checkpoint)
+    >>> [issue.secret for issue in issues]
+    ['Test']
+    >>> Checkpoint(tmp.name, "scan").resume()
+    False
+    >>> tmp.cleanup()
+
+    """
+    files = walk(target, config, metrics, deadline)
+    if deadline is not None or coverage is not None:
+        coverage = coverage or Coverage(target)
+        files = _covered(files, coverage, deadline)
+    results = scaniter(
+        files,
+        config,
+        rules,
+        processes,
+        baseline,
+        profile,
+        metrics,
+        pool,
+        checkpoint,
+    )
+
+    issues = []
+    finished = True
+    with closing(results):
+        for issue in results:
+            issues.append(issue)
+            if failed(issue, config):
+                log.info(f"failing fast on '{issue.rule.id}' in {issue.path}")
+                finished = False
+                break
+
+    if metrics is not None:
+        metrics.issues += len(issues)
+
+    if coverage is not None and not finished:
+        coverage.stop()
+
+    complete = coverage is None or coverage.complete
+    if checkpoint is not None and finished and complete:
+        checkpoint.clear()
+
+    return issues
+
+
+def failed(issue: Issue, config: Config) -> bool:
+    """Return true if issue should stop the scan in fail-fast mode.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> rule = Pattern(id="p", message="p", pattern="p", severity="medium")
+    >>> issue = Issue(rule=rule, path="p", line=1, secret="p", context={})
+    >>> failed(issue, Config())
+    False
+    >>> failed(issue, Config(fail_fast="medium"))
+    True
+    >>> failed(issue, Config(fail_fast="high"))
+    False
+
+    """
+    return (
+        config.fail_fast is not None
+        and config.fail_fast <= issue.rule.severity
+    )
+
+
+def scaniter(
+    files: Iterable[File],
+    config: Config,
+    rules: Iterable[Union[Entropy, Pattern]],
+    processes: int = None,
+    baseline: Baseline = None,
+    profile: Profile = None,
+    metrics: Metrics = None,
+    pool: "multiprocessing.pool.Pool" = None,
+    checkpoint: Checkpoint = None,
+) -> Iterator[Issue]:
+    """Search files using worker processes and yield issues as they arrive.
+
+    Note
+    ----
+    See `core.scan` for details.
+
+    If `files` is not a list, at most a few batches per process are read
+    ahead, so that memory usage does not depend on the number of files.
+
+    Issues are deduplicated by ID as they arrive, only the first one found is
+    yielded. Workers also drop issues they have already returned during the
+    same scan, so that duplicates are not even sent back.
+
+    Findings of files with known Git `blob` are kept in a single cache entry
+    per search options, which is saved once after the scan if anything new
+    was found.
+
+    """
     if config.no_entropy:  # pragma: no cover
         rules = [r for r in rules if not isinstance(r, Entropy)]
 
@@ -43,38 +230,430 @@ def scan(
     if not rules:  # pragma: no cover
         raise ValueError("empty ruleset")
 
+    if config.engine:  # pragma: no cover
+        rules = [
+            (
+                attr.evolve(r, engine=config.engine)
+                if isinstance(r, Pattern)
+                else r
+            )
+            for r in rules
+        ]
+
+    rules = RuleIndex(rules)
+
+    # findings of unchanged Git blobs only depend on these and file path
+    fingerprint = cache.key(
+        "search",
+        repr(rules),
+        repr(config.exclude),
+        str(config.ignore_nosecret),
+        str(config.context),
+        str(config.max_issues),
+        str(config.engine),
+    )
+    worker = partial(
+        _search,
+        fingerprint=fingerprint,
+        token=uuid.uuid4().hex,
+        profile=profile is not None,
+        metrics=metrics is not None,
+        rules=rules,
+        exclude=config.exclude,
+        ignore_nosecret=config.ignore_nosecret,
+        context=config.context,
+        limit=config.max_issues,
+        baseline=baseline,
+    )
+
+    chunksize = 1
+    if isinstance(files, list):
+        chunksize = max(1, len(files) // ((processes or CPU_COUNT) * 4))
+
+    inline = pool is None and processes == 1
+    if pool or inline:
+        context = nullcontext(pool)
+    else:
+        context = multiprocessing.Pool(processes)
+
+    seen = set()
+    findings, missed = {}, False
+    if checkpoint is not None:
+        # units are reported to checkpoint in order, thus it is never a list
+        files = checkpoint.units(files)
+        for issue in checkpoint.issues:
+            seen.add(issue.id)
+            yield issue
+
+    with context as p, _saving(checkpoint):
+        if inline:
+            results = map(worker, files)
+        elif isinstance(files, list) and config.fail_fast:
+            results = p.imap_unordered(worker, files, chunksize)
+        elif isinstance(files, list):
+            results = p.imap(worker, files, chunksize)
+        else:
+            window = (processes or CPU_COUNT) * 2
+            results = _bounded(p, worker, files, window)
+
+        finished = False
+        try:
+            for issues, stats, counters, entry in results:
+                if profile is not None:
+                    profile.merge(stats)
+                if metrics is not None:
+                    metrics.merge(counters)
+                if entry is not None:
+                    key, found, hit = entry
+                    findings[key] = found
+                    missed = missed or not hit
+
+                new = []
+                for issue in issues:
+                    if issue.id not in seen:
+                        seen.add(issue.id)
+                        new.append(issue)
+
+                if checkpoint is not None:
+                    checkpoint.complete(new)
+
+                yield from new
+            finished = True
+        finally:
+            if missed:
+                _keep(fingerprint, findings, finished)
+
+
+@contextmanager
+def _saving(checkpoint: Checkpoint = None) -> Iterator[None]:
+    """Save checkpoint on exit, e.g. once the scan is interrupted."""
+    try:
+        yield
+    finally:
+        if checkpoint is not None:
+            checkpoint.save()
+
+
+def walk(
+    target: str,
+    config: Config,
+    metrics: Metrics = None,
+    deadline: float = None,
+) -> Iterable[File]:
+    """Return files and Git history diffs to be searched in target path.
+
+    Note
+    ----
+    Only staged changes are returned if `config.staged` is set.
+    Lazy iterator over `sys.stdin` chunks is returned for target `-`.
+
+    Lazy iterator over archive members is returned if target is an archive.
+    Archives found in target directory are searched if `config.archives` is
+    set, their members are appended lazily after other files of current tree.
+
+    Files of current tree come first, followed by Git history diffs from
+    the most recent commits to the oldest ones.
+
+    If `config.shard` is set to `(index, count)`, only files and diffs of the
+    given shard are returned, see `source.shardof`.
+
+    If `deadline` is set and `time.monotonic` reaches it while walking current
+    tree, walking stops and nothing is returned, since no more files may be
+    searched anyway.
+
+    """
+    if target == STREAM_TARGET:  # pragma: no cover
+        sys.stdin.reconfigure(errors="replace")
+        return streamiter(sys.stdin)
+
     exclude = []
     for e in config.exclude or []:
         if e.id is None and e.pattern is None:
             exclude.extend(e.paths)
 
+    if os.path.isfile(target) and isarchive(target):  # pragma: no cover
+        return archiveiter(target, exclude, metrics=metrics)
+
     files = []
+    if config.staged:  # pragma: no cover
+        start = time.perf_counter()
+        files.extend(stagediter(target, exclude, metrics))
+        if metrics is not None:
+            metrics.diff += time.perf_counter() - start
+        return files
+
+    archives = []
+    if not config.no_current:  # pragma: no cover
+        start = time.perf_counter()
+        blobs = gitblobs(target) if not _expired(deadline) else {}
+        for file in diriter(target, exclude, metrics, blobs=blobs):
+            if _expired(deadline):
+                log.warning(f"time budget exceeded while walking {target}")
+                return []
+            if config.archives and isarchive(file._real):
+                archives.append(file)
+            else:
+                files.append(file)
+        # directories are walked concurrently, sort files for stable order
+        files.sort(key=lambda f: f.path)
+        if config.fail_fast:
+            # files likely to contain secrets are searched first
+            files.sort(key=lambda f: LIKELY_RE.search(f.path) is None)
+        if metrics is not None:
+            metrics.walk += time.perf_counter() - start
+
+    # archives are a part of current tree, thus go before history
+    lazy = [
+        archiveiter(a._real, exclude, metrics=metrics, name=a.path)
+        for a in archives
+    ]
     if not config.no_history:  # pragma: no cover
-        files.extend(
-            gititer(
-                target,
-                exclude=exclude,
-                branch=config.branch,
-                depth=config.depth,
-                since=config.since,
-            )
+        diffs = gititer(
+            target,
+            exclude=exclude,
+            branch=config.branch,
+            depth=config.depth,
+            since=config.since,
+            metrics=metrics,
         )
+        lazy.append(_timed(diffs, metrics, "diff"))
+
+    if config.shard:  # pragma: no cover
+        index, count = config.shard
+        files = [f for f in files if shardof(f, count) == index]
+        lazy = [(f for f in it if shardof(f, count) == index) for it in lazy]
+
+    if lazy:  # pragma: no cover
+        return chain(files, *lazy)
+
+    return files
+
+
+def _covered(
+    files: Iterable[File], coverage: Coverage, deadline: float = None
+) -> Iterator[File]:
+    """Yield files until deadline, recording them in coverage."""
+    for file in files:
+        if _expired(deadline):
+            log.warning(f"time budget exceeded, {coverage.target} is partial")
+            coverage.stop(file)
+            return
+        coverage.add(file)
+        yield file
+
+    # walk itself stops early once deadline is reached
+    if _expired(deadline):
+        coverage.stop()
+
+
+def _expired(deadline: float = None) -> bool:
+    """Return true if deadline is set and has been reached."""
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _timed(
+    files: Iterable[File], metrics: Metrics = None, stage: str = "diff"
+) -> Iterator[File]:
+    """Yield files, adding time spent on producing them to metrics stage."""
+    if metrics is None:
+        yield from files
+        return
+
+    it = iter(files)
+    while True:
+        start = time.perf_counter()
+        file = next(it, None)
+        elapsed = time.perf_counter() - start
+        setattr(metrics, stage, getattr(metrics, stage) + elapsed)
+        if file is None:
+            return
+        yield file
+
+
+def _bounded(
+    pool: "multiprocessing.pool.Pool",
+    func: Callable[[File], Any],
+    files: Iterable[File],
+    window: int,
+) -> Iterator[Any]:
+    """Map files using pool with at most `window` pending batches.
 
-    if not config.no_current:  # pragma: no cover
-        files.extend(diriter(target, exclude))
+    Note
+    ----
+    Unlike `Pool.imap`, which consumes the whole iterable upfront, files are
+    only read once there is room for them. Results are yielded in order.
 
-    worker = partial(
-        search,
-        rules=rules,
-        exclude=config.exclude,
-        ignore_nosecret=config.ignore_nosecret,
-        context=config.context,
-    )
+    Files are sent in batches of up to `BATCH_FILES` files or `BATCH_SIZE`
+    characters of loaded content, whichever is reached first.
+
+    """
+    pending = deque()
+    for batch in _batches(files):
+        pending.append(pool.apply_async(_mapbatch, (func, batch)))
+        if len(pending) >= window:
+            yield from pending.popleft().get()
+
+    while pending:
+        yield from pending.popleft().get()
+
+
+def _batches(
+    files: Iterable[File],
+    count: int = BATCH_FILES,
+    size: int = BATCH_SIZE,
+) -> Iterator[List[File]]:
+    """Group files into batches limited by count and content size.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> files = [File("a", content="x" * 3) for _ in range(5)]
+    >>> [len(b) for b in _batches(files, count=2)]
+    [2, 2, 1]
+    >>> [len(b) for b in _batches(files, size=5)]
+    [2, 2, 1]
+
+    """
+    batch, total = [], 0
+    for file in files:
+        batch.append(file)
+        total += len(file._content or "")
+        if len(batch) >= count or total >= size:
+            yield batch
+            batch, total = [], 0
+
+    if batch:
+        yield batch
+
+
+def _mapbatch(func: Callable[[File], Any], files: List[File]) -> List[Any]:
+    """Apply function to batch of files in worker process."""
+    return [func(file) for file in files]
+
+
+def _search(
+    file: File,
+    fingerprint: str = None,
+    token: str = None,
+    profile: bool = False,
+    metrics: bool = False,
+    baseline: Container[uuid.UUID] = None,
+    **kwargs,
+) -> Tuple[List[Issue], Optional[Profile], Optional[Metrics], Optional[Tuple]]:
+    """Search file in worker process and return issues with stats.
+
+    Note
+    ----
+    Findings of files with known Git `blob` are looked up in findings cached
+    by `fingerprint` of search options, so that unchanged files are not even
+    read next time. Such findings are returned as `(key, issues, hit)` entry
+    for the parent process to save them.
+
+    Issues already returned by this process during the scan identified by
+    `token` are dropped.
+
+    """
+    stats = Profile() if profile else None
+    counters = Metrics() if metrics else None
+
+    key = None
+    if fingerprint and file.blob:
+        key = (file.blob, file.path)
+
+    issues = _stored(fingerprint, token).get(key) if key else None
+    hit = issues is not None
+    if issues is None:
+        start = time.perf_counter()
+        memo = helper.cached_entropy.cache_info()
+        issues = search(
+            file,
+            baseline=None if key else baseline,
+            profile=stats,
+            metrics=counters,
+            **kwargs,
+        )
+        if counters is not None:
+            counters.search += time.perf_counter() - start
+            info = helper.cached_entropy.cache_info()
+            counters.entropy_hits += info.hits - memo.hits
+            counters.entropy_misses += info.misses - memo.misses
+    elif counters is not None:
+        counters.cached += 1
 
-    with multiprocessing.Pool(processes) as pool:
-        issues = pool.map(worker, files)
+    entry = (key, issues, hit) if key else None
+    if key and baseline is not None:
+        issues = [i for i in issues if i.id not in baseline]
 
-    return set(chain.from_iterable(issues))
+    if token is not None:
+        issues = _unseen(issues, token)
+
+    return issues, stats, counters, entry
+
+
+# findings cached by search fingerprint, loaded once per scan and process
+_findings: Tuple[Optional[Tuple[str, str]], Findings] = (None, {})
+
+
+def _stored(fingerprint: str, token: str = None) -> Findings:
+    """Return findings cached by fingerprint, loading them once per scan."""
+    global _findings
+    if token is None or _findings[0] != (fingerprint, token):
+        _findings = ((fingerprint, token), cache.get(fingerprint) or {})
+
+    return _findings[1]
+
+
+def _keep(
+    fingerprint: str,
+    findings: Findings,
+    finished: bool = True,
+):
+    """Save findings of the scan, dropping those of files no longer seen.
+
+    Note
+    ----
+    Previously cached findings are kept as well if the scan stopped early.
+
+    """
+    if not finished:
+        findings = {**(cache.get(fingerprint) or {}), **findings}
+    cache.put(fingerprint, findings)
+
+
+# IDs of issues returned by this process during the latest scan
+_seen: Tuple[Optional[str], Set[uuid.UUID]] = (None, set())
+
+
+def _unseen(issues: Iterable[Issue], token: str) -> List[Issue]:
+    """Return issues not yet returned by this process during the scan.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> rule = Pattern(id="p", message="p", pattern="p")
+    >>> issue = Issue(rule=rule, path="p", line=1, secret="p", context={})
+    >>> len(_unseen([issue, issue], "scan-1"))
+    1
+    >>> len(_unseen([issue], "scan-1"))
+    0
+    >>> len(_unseen([issue], "scan-2"))
+    1
+
+    """
+    global _seen
+    if _seen[0] != token:
+        _seen = (token, set())
+
+    seen = _seen[1]
+    unseen = []
+    for issue in issues:
+        if issue.id not in seen:
+            seen.add(issue.id)
+            unseen.append(issue)
+
+    return unseen
 
 
 def diff(
@@ -109,6 +688,8 @@ def load_config(path: str, **kwargs) -> Config:
 
     All `kwargs` are passed to `Config.update` method after loading.
 
+    Loaded config is cached on disk by file content.
+
     Examples
     --------
     Basic usage examples. Load config from file
@@ -135,7 +716,12 @@ def load_config(path: str, **kwargs) -> Config:
     for config_path in (path, path / DEFAULT_CONFIG_FILE):
         if config_path.is_file():
             log.info(f"loading config from {config_path.absolute()}")
-            config = load(Config, config_path)
+            raw = config_path.read_text()
+            key = cache.key("config", raw)
+            config = cache.get(key)
+            if config is None:
+                config = loads(Config, raw)
+                cache.put(key, config)
             break
     else:
         config = Config()  # pragma: no cover
@@ -149,6 +735,13 @@ def load_rules(
 ) -> Iterable[Union[Entropy, Pattern]]:
     """Load rules from file.
 
+    Note
+    ----
+    Pattern rules are statically analysed for catastrophic backtracking.
+    Rules with exponential backtracking risk are rejected.
+
+    Loaded rules are cached on disk by file content and severity.
+
     Examples
     --------
     Basic usage examples
@@ -160,13 +753,29 @@ def load_rules(
     >>> len(load_rules(DEFAULT_RULES_FILE, Severity.HIGH))
     2
     """
+    raw = Path(path or DEFAULT_RULES_FILE).read_text()
+    key = cache.key("rules", raw, str(severity))
+    rules = cache.get(key)
+    if rules is not None:
+        return rules
+
     rules = []
-    for r in load(Rule.fromargs, path or DEFAULT_RULES_FILE):
-        if r.severity >= severity:
-            rules.append(r)
-        else:
+    for r in loads(Rule.fromargs, raw):
+        if r.severity < severity:
             log.warning("skipping rule: %s", r.id)
+            continue
+
+        risks = redos.analyse(r.pattern) if isinstance(r, Pattern) else []
+        if any(risk.kind == redos.EXPONENTIAL for risk in risks):
+            log.error("rejecting rule %s: %s", r.id, risks[0].message)
+            continue
+
+        for risk in risks:
+            log.warning("rule %s: %s", r.id, risk.message)
+
+        rules.append(r)
 
+    cache.put(key, rules)
     return rules
 
 
@@ -252,7 +861,7 @@ def loads(cls: type, raw: str) -> Union[Model, List[Model]]:
     [{'version': 'v1', 'numbers': [1, 2]}, {'version': 'v2', 'numbers': [3]}]
 
     """
-    data = yaml.safe_load(raw)
+    data = yaml.load(raw, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
     if isinstance(data, list):
         model = [cls(**item) for item in data]
     else:
@@ -0,0 +1,115 @@
+"""Regular expression engines for pattern rules.
+
+Note
+----
+Stdlib `re` is always available. Third-party engines are optional, install
+`regex` or an RE2 binding providing `re2` module, e.g. `google-re2`, to use
+them. RE2 guarantees linear time matching, but does not support some of the
+`re` syntax, e.g. lookarounds and backreferences.
+
+Patterns which cannot be compiled by the selected engine, or engines which
+are not installed, fall back to `re`.
+
+"""
+
+import functools
+import importlib
+import importlib.util
+import re
+
+from types import ModuleType
+from typing import Any, Iterable, List
+
+from trufflehog3 import log
+
+RE = "re"
+REGEX = "regex"
+RE2 = "re2"
+
+ENGINES = (RE, REGEX, RE2)
+DEFAULT_ENGINE = RE
+
+
+def available(name: str) -> bool:
+    """Check whether engine is known and installed.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> available("re")
+    True
+    >>> available("perl")
+    False
+
+    """
+    return name in ENGINES and importlib.util.find_spec(name) is not None
+
+
+def compile(pattern: str, name: str = DEFAULT_ENGINE) -> Any:
+    """Compile pattern using the given engine, falling back to `re`.
+
+    Note
+    ----
+    Compiled patterns are cached, since rules are recompiled by every worker
+    process once they are unpickled.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> compile("letmein").findall("password = 'letmein'")
+    ['letmein']
+    >>> compile("letmein", "perl").pattern
+    'letmein'
+
+    """
+    return _compile(pattern, name if available(name) else _missing(name))
+
+
+def incompatible(patterns: Iterable[str], name: str) -> List[str]:
+    """Return patterns which cannot be compiled by the given engine.
+
+    Note
+    ----
+    All patterns are reported if the engine is not installed.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> incompatible(["letmein", "(?<=a)b", "("], "re")
+    ['(']
+
+    """
+    module = _module(name) if available(name) else None
+    result = []
+    for pattern in patterns:
+        try:
+            module.compile(pattern)
+        except Exception:
+            result.append(pattern)
+
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(pattern: str, name: str) -> Any:
+    if name != RE:
+        try:
+            return _module(name).compile(pattern)
+        except Exception as e:
+            log.info(f"{name}: falling back to re for '{pattern}': {e}")
+
+    return re.compile(pattern)
+
+
+@functools.lru_cache(maxsize=None)
+def _module(name: str) -> ModuleType:
+    return importlib.import_module(name)
+
+
+@functools.lru_cache(maxsize=None)
+def _missing(name: str) -> str:
+    log.warning(f"regex engine '{name}' is not available, using re")
+    return RE
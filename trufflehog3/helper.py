@@ -1,9 +1,16 @@
 """Helper functions."""
 
+import functools
+import importlib
 import logging
 import math
+import types
 
-from typing import List, Dict
+from typing import List, Dict, Union
+
+ENTROPY_CACHE_SIZE = 1 << 16
+# longer strings are rarely repeated and would bloat the cache
+ENTROPY_CACHE_MAX_LENGTH = 256
 
 
 class Color:
@@ -24,6 +31,39 @@ class Color:
     UNDERLINE = "\x1b[4m"
 
 
+class LazyModule(types.ModuleType):
+    """Module proxy which imports the real module on first attribute access.
+
+    Examples
+    --------
+    >>> import sys
+    >>> json = LazyModule("json")
+    >>> json.dumps([1])
+    '[1]'
+    >>> "json" in sys.modules
+    True
+
+    """
+
+    def __getattr__(self, name):
+        """Import the real module and get attribute from it."""
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(vars(module))
+        return getattr(module, name)
+
+
+def lazy(name: str) -> types.ModuleType:
+    """Return module which is only imported once it is actually used.
+
+    Note
+    ----
+    Heavy dependencies are imported lazily to keep CLI startup fast.
+    Type annotations referring to such modules must be strings.
+
+    """
+    return LazyModule(name)
+
+
 def colored(s: str, color: str = Color.GREEN) -> str:
     """Return ANSI-colored string."""
     return f"{color}{s}{Color.RESET}"
@@ -78,7 +118,9 @@ def logger(level: int = logging.ERROR, name="secret") -> logging.Logger:
     return log
 
 
-def get_lines(s: str, line: int, context: int = 0) -> Dict[int, str]:
+def get_lines(
+    s: Union[str, List[str]], line: int, context: int = 0, offset: int = 0
+) -> Dict[int, str]:
     r"""Extract lines with context from the given string.
 
     Return dict with lines range and the extracted lines.
@@ -86,6 +128,8 @@ def get_lines(s: str, line: int, context: int = 0) -> Dict[int, str]:
     Note
     ----
     It is supposed that `line` parameter is 1-indexed.
+    Returned line numbers are shifted by `offset`.
+    Pass already split lines to avoid splitting the string on every call.
 
     Examples
     --------
@@ -100,13 +144,17 @@ def get_lines(s: str, line: int, context: int = 0) -> Dict[int, str]:
     {'3': '3', '4': '4', '5': '5'}
     >>> get_lines(s, 3, 10)
     {'1': '1', '2': '2', '3': '3', '4': '4', '5': '5'}
+    >>> get_lines(s, 1, 1, offset=10)
+    {'11': '1', '12': '2'}
+    >>> get_lines(s.splitlines(), 2)
+    {'2': '2'}
 
     """
-    lines = s.splitlines()
+    lines = s.splitlines() if isinstance(s, str) else s
     lower = max(0, line - context - 1)
     upper = min(len(lines), line + context)
 
-    return {f"{i + 1}": lines[i] for i in range(lower, upper)}
+    return {f"{i + 1 + offset}": lines[i] for i in range(lower, upper)}
 
 
 def get_strings(s: str, alphabet: str, minlen: int) -> List[str]:
@@ -172,3 +220,44 @@ def shannon_entropy(s: str, alphabet: str) -> float:
             entropy += -px * math.log(px, 2)
 
     return entropy
+
+
+def cached_entropy(s: str, alphabet: str) -> float:
+    """Calculate Shannon entropy, memoizing results for repeated strings.
+
+    Note
+    ----
+    Cache is bounded by `ENTROPY_CACHE_SIZE` entries and local to the process.
+    Strings longer than `ENTROPY_CACHE_MAX_LENGTH` are never memoized, so that
+    the cache size is bounded as well.
+    Use `cached_entropy.cache_info()` to get hit and miss counters.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> cached_entropy.cache_clear()
+    >>> cached_entropy("abcd", "abcdefghijklmnopqrstuvwxyz")
+    2.0
+    >>> cached_entropy("abcd", "abcdefghijklmnopqrstuvwxyz")
+    2.0
+    >>> cached_entropy.cache_info().hits
+    1
+    >>> cached_entropy("abcd" * 100, "abcdefghijklmnopqrstuvwxyz")
+    2.0
+    >>> cached_entropy.cache_info().currsize
+    1
+
+    """
+    if len(s) > ENTROPY_CACHE_MAX_LENGTH:
+        return shannon_entropy(s, alphabet)
+    return _memoized_entropy(s, alphabet)
+
+
+@functools.lru_cache(maxsize=ENTROPY_CACHE_SIZE)
+def _memoized_entropy(s: str, alphabet: str) -> float:
+    return shannon_entropy(s, alphabet)
+
+
+cached_entropy.cache_info = _memoized_entropy.cache_info
+cached_entropy.cache_clear = _memoized_entropy.cache_clear
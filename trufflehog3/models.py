@@ -9,9 +9,9 @@ from abc import ABC, abstractmethod
 from datetime import datetime
 from enum import auto, Enum, EnumMeta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from trufflehog3 import log, helper, IGNORE_NOSECRET
+from trufflehog3 import log, engine, helper, IGNORE_NOSECRET
 
 _NAMESPACE = uuid.UUID("00000000-0000-0000-0000-000000000000")
 
@@ -20,6 +20,8 @@ BASE64_LIMIT = 4.5
 HEX_CHARS = string.hexdigits
 HEX_LIMIT = 3.0
 
+_tuple = attr.converters.optional(tuple)
+
 
 class CaseInsensitiveEnumMeta(EnumMeta):
     """Meta class for case-insensitive enum."""
@@ -76,6 +78,9 @@ class Format(Enum, metaclass=CaseInsensitiveEnumMeta):
 class Model:
     """Model is a base class for all models definitions."""
 
+    # allows subclasses to define slots
+    __slots__ = ()
+
     def asdict(self):
         """Convert model to dictionary."""
         return attr.asdict(
@@ -83,17 +88,17 @@ class Model:
         )
 
 
-@attr.s(frozen=True)
-class File(Model):
-    """File is a basic wrapper with Git metadata support.
+@attr.s(frozen=True, slots=True)
+class Commit(Model):
+    """Commit holds Git commit metadata shared by all diffs of the commit.
 
     Attributes
     ----------
-    path (str)
-    : File path.
+    id (str)
+    : Git commit hash.
 
     branch (str, optional)
-    : Git commit branch.
+    : Git commit branches, comma-separated.
 
     message (str, optional)
     : Git commit message.
@@ -101,12 +106,38 @@ class File(Model):
     author (str, optional)
     : Git commit author as `name <email>`.
 
-    commit (str, optional)
-    : Git commit hash.
-
     date (datetime.datetime, optional)
     : Git commit timestamp.
 
+    """
+
+    id: str = attr.ib()
+    branch: Optional[str] = attr.ib(None)
+    message: Optional[str] = attr.ib(None)
+    author: Optional[str] = attr.ib(None)
+    date: Optional[datetime] = attr.ib(None)
+
+
+@attr.s(frozen=True, slots=True)
+class File(Model):
+    """File is a basic wrapper with Git metadata support.
+
+    Attributes
+    ----------
+    path (str)
+    : File path.
+
+    meta (Commit, optional)
+    : Git commit metadata, the same object is referenced by all diffs of the
+      commit. It is also available as `branch`, `message`, `author`, `commit`
+      and `date` properties.
+
+    offset (int, optional)
+    : Number of lines preceding content, if it is a part of a larger file.
+
+    blob (str, optional)
+    : Git blob ID of file content, if it is known to be unchanged.
+
     Args
     ----
     content (str, optional)
@@ -123,16 +154,45 @@ class File(Model):
     >>> f.read()
     'Test'
 
+    With Git commit metadata
+
+    >>> f = File("code.py", meta=Commit("c1", author="User"), content="Test")
+    >>> f.commit, f.author, f.branch
+    ('c1', 'User', None)
+
     """
 
     path: str = attr.ib()
-    branch: Optional[str] = attr.ib(None)
-    message: Optional[str] = attr.ib(None)
-    commit: Optional[str] = attr.ib(None)
-    author: Optional[str] = attr.ib(None)
-    date: Optional[datetime] = attr.ib(None)
+    meta: Optional[Commit] = attr.ib(None)
     _content: Optional[str] = attr.ib(None)
     _real: Optional[str] = attr.ib(None)
+    offset: int = attr.ib(0)
+    blob: Optional[str] = attr.ib(None)
+
+    @property
+    def commit(self) -> Optional[str]:
+        """Return Git commit hash."""
+        return self.meta.id if self.meta else None
+
+    @property
+    def branch(self) -> Optional[str]:
+        """Return Git commit branches."""
+        return self.meta.branch if self.meta else None
+
+    @property
+    def message(self) -> Optional[str]:
+        """Return Git commit message."""
+        return self.meta.message if self.meta else None
+
+    @property
+    def author(self) -> Optional[str]:
+        """Return Git commit author."""
+        return self.meta.author if self.meta else None
+
+    @property
+    def date(self) -> Optional[datetime]:
+        """Return Git commit timestamp."""
+        return self.meta.date if self.meta else None
 
     def read(self) -> str:
         """Return the given content or read file from path."""
@@ -171,10 +231,7 @@ class Rule(Model, ABC):
     @staticmethod
     def fromdict(x: Dict[str, Any]) -> Any:
         """Convert dict to rule subclass."""
-        try:
-            return Pattern(**x)
-        except Exception:
-            return Entropy(**x)
+        return Pattern(**x) if "pattern" in x else Entropy(**x)
 
     @staticmethod
     def fromargs(**x: Any) -> Any:
@@ -208,6 +265,12 @@ class Entropy(Rule):
     minlen (int, optional)
     : Minimum match length.
 
+    paths (List[str], optional)
+    : Only apply the rule to files matching these globs.
+
+    exclude_paths (List[str], optional)
+    : Never apply the rule to files matching these globs.
+
     Examples
     --------
     There are two ways to customize high entropy check.
@@ -231,6 +294,9 @@ class Entropy(Rule):
     _alphabet: Optional[str] = attr.ib(BASE64_CHARS)
     _threshold: Optional[float] = attr.ib(BASE64_LIMIT)
     _minlen: Optional[int] = attr.ib(20)
+    # tuples, since rules are hashed
+    _paths: Optional[Tuple[str]] = attr.ib(None, converter=_tuple)
+    _exclude_paths: Optional[Tuple[str]] = attr.ib(None, converter=_tuple)
     _uuid: uuid.UUID = attr.ib(init=False)
 
     @_uuid.default
@@ -261,7 +327,7 @@ class Entropy(Rule):
         matched = []
 
         for word in helper.get_strings(s, self._alphabet, self._minlen):
-            if helper.shannon_entropy(word, self._alphabet) > self._threshold:
+            if helper.cached_entropy(word, self._alphabet) > self._threshold:
                 matched.append(word)
 
         return matched
@@ -285,6 +351,17 @@ class Pattern(Rule):
     severity (Severity, optional)
     : Severity of issues detected by the rule.
 
+    Args
+    ----
+    paths (List[str], optional)
+    : Only apply the rule to files matching these globs.
+
+    exclude_paths (List[str], optional)
+    : Never apply the rule to files matching these globs.
+
+    engine (str, optional)
+    : Regular expression engine to compile pattern with, see `engine`.
+
     Examples
     --------
     Match `letmein` string everywhere
@@ -305,12 +382,25 @@ class Pattern(Rule):
     ...     severity="high",
     ... )
 
+    Match `letmein` in Python files only
+
+    >>> rule = Pattern(
+    ...     id="bad-password-letmein",
+    ...     message="Bad Password 'letmein'",
+    ...     pattern="letmein",
+    ...     paths=["**/*.py"],
+    ... )
+
     """
 
     id: str = attr.ib()
     message: str = attr.ib()
     pattern: str = attr.ib()
     severity: Optional[Severity] = attr.ib(Severity.MEDIUM, converter=Severity)
+    # tuples, since rules are hashed
+    _paths: Optional[Tuple[str]] = attr.ib(None, converter=_tuple)
+    _exclude_paths: Optional[Tuple[str]] = attr.ib(None, converter=_tuple)
+    _engine: Optional[str] = attr.ib(engine.DEFAULT_ENGINE)
     _uuid: uuid.UUID = attr.ib(init=False)
     _pattern: re.Pattern = attr.ib(init=False)
 
@@ -320,7 +410,16 @@ class Pattern(Rule):
 
     @_pattern.default
     def _pattern_default(self):
-        return re.compile(self.pattern)
+        return engine.compile(self.pattern, self._engine)
+
+    def __getstate__(self):
+        """Drop compiled pattern, which not all engines can pickle."""
+        return {k: v for k, v in self.__dict__.items() if k != "_pattern"}
+
+    def __setstate__(self, state):
+        """Compile pattern again after unpickling."""
+        self.__dict__.update(state)
+        self.__dict__["_pattern"] = self._pattern_default()
 
     def findall(self, s: str) -> List[str]:
         """Find pattern occurrences in the string.
@@ -361,6 +460,11 @@ class Exclude(Rule):
     : File paths for rule to be applied on, defaults to everywhere.
       Each item should be a glob pattern as recognized by `pathlib.Path.match`.
 
+    Args
+    ----
+    engine (str, optional)
+    : Regular expression engine to search for pattern with, see `engine`.
+
     Note
     ----
     Only one of `id`, `pattern` must be set.
@@ -399,13 +503,28 @@ class Exclude(Rule):
         None, converter=lambda x: re.compile(x) if x else None
     )
     paths: Optional[List[str]] = attr.ib(None)
+    _engine: Optional[str] = attr.ib(engine.DEFAULT_ENGINE, repr=False)
+    _regex: Any = attr.ib(init=False, repr=False)
+
+    @_regex.default
+    def _regex_default(self):
+        if self.pattern is None or self._engine == engine.RE:
+            return self.pattern
+        return engine.compile(self.pattern.pattern, self._engine)
+
+    def __getstate__(self):
+        """Drop compiled pattern, which not all engines can pickle."""
+        return {k: v for k, v in self.__dict__.items() if k != "_regex"}
+
+    def __setstate__(self, state):
+        """Compile pattern again after unpickling."""
+        self.__dict__.update(state)
+        self.__dict__["_regex"] = self._regex_default()
 
     def findall(self, s: str) -> List[str]:
         """Find pattern occurrences in the string."""
         return (
-            [m.group() for m in self.pattern.finditer(s)]
-            if self.pattern
-            else []
+            [m.group() for m in self._regex.finditer(s)] if self._regex else []
         )
 
     @staticmethod
@@ -440,7 +559,7 @@ class Context(dict):
         return 0
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, eq=False)
 class Issue(Model):
     r"""Issue holds finding metadata.
 
@@ -480,6 +599,10 @@ class Issue(Model):
     date (datetime.datetime, optional)
     : Git commit timestamp.
 
+    suppressed (int, optional)
+    : Number of further distinct issues of the same rule in the same file or
+      diff part, which were dropped by `max_issues` limit.
+
     Examples
     --------
     Basic usage examples
@@ -503,6 +626,8 @@ class Issue(Model):
     ... )
     >>> issue.id
     UUID('bfd860e4-2002-30dd-a1b1-24e29083c7d5')
+    >>> "suppressed" in issue.asdict()
+    False
 
     """
 
@@ -517,11 +642,16 @@ class Issue(Model):
     author: Optional[str] = attr.ib(None)
     commit: Optional[str] = attr.ib(None)
     date: Optional[datetime] = attr.ib(None)
+    suppressed: Optional[int] = attr.ib(0)
 
     @id.default
     def _id_default(self):
-        fields = ":".join((self.path, self.secret))
-        return uuid.uuid3(self.rule._uuid, fields)
+        return Issue.genid(self.rule, self.path, self.secret)
+
+    @staticmethod
+    def genid(rule: Rule, path: str, secret: str) -> uuid.UUID:
+        """Generate issue ID from rule UUID, file path and secret."""
+        return uuid.uuid3(rule._uuid, ":".join((path, secret)))
 
     def __eq__(self, other):  # pragma: no cover
         """Override equality check to use issue IDs."""
@@ -531,6 +661,13 @@ class Issue(Model):
         """Override hash check to use issue ID."""
         return self.id.int
 
+    def asdict(self):
+        """Convert issue to dictionary, omitting zero `suppressed` count."""
+        data = super().asdict()
+        if not self.suppressed:
+            del data["suppressed"]
+        return data
+
     @property
     def multiline(self) -> bool:
         """Return true if context contains multiple lines."""
@@ -565,6 +702,11 @@ class Config(Model):
     ignore_nosecret: Optional[bool] = attr.ib(IGNORE_NOSECRET)
     no_entropy: Optional[bool] = attr.ib(False)
     no_pattern: Optional[bool] = attr.ib(False)
+    engine: Optional[str] = attr.ib(None)
+    fail_fast: Optional[Severity] = attr.ib(
+        None, converter=attr.converters.optional(Severity)
+    )
+    max_issues: Optional[int] = attr.ib(None)
 
     # source configuration
     branch: Optional[str] = attr.ib(None)
@@ -572,6 +714,21 @@ class Config(Model):
     since: Optional[str] = attr.ib(None)
     no_current: Optional[bool] = attr.ib(False)
     no_history: Optional[bool] = attr.ib(False)
+    staged: Optional[bool] = attr.ib(False)
+    archives: Optional[bool] = attr.ib(False)
+    shard: Optional[Tuple[int, int]] = attr.ib(
+        None,
+        converter=lambda x: (
+            tuple(map(int, x.split("/"))) if isinstance(x, str) else _tuple(x)
+        ),
+    )
 
     # render configuration
     context: Optional[int] = attr.ib(0)
+
+    def __attrs_post_init__(self):
+        """Compile exclude patterns using the configured engine."""
+        if self.engine and self.exclude:
+            self.exclude = [
+                attr.evolve(e, engine=self.engine) for e in self.exclude
+            ]
@@ -0,0 +1,604 @@
+"""Regular expression denial of service (ReDoS) checks for pattern rules.
+
+Static analysis works on the parsed regular expression tree and looks for
+constructs known to cause super-linear backtracking in `re`:
+
+- nested quantifiers, e.g. `(a+)+` or `(\\w+\\s?)*`
+- quantified alternation with overlapping branches, e.g. `(\\w|\\d\\w)*`
+- adjacent quantifiers with overlapping characters, e.g. `\\d+\\w+`
+
+The first two may take exponential time and the last one polynomial time.
+
+Runtime check measures rules against long adversarial inputs derived from
+their patterns in a separate process, so that hanging rules can be killed.
+
+"""
+
+import attr
+import math
+import re
+import time
+
+from re import _constants as c
+from re import _parser as sre
+from typing import Iterable, List, Optional, Tuple
+
+from trufflehog3 import helper
+from trufflehog3.models import Model, Pattern
+
+multiprocessing = helper.lazy("multiprocessing")
+
+EXPONENTIAL = "exponential"
+POLYNOMIAL = "polynomial"
+
+NESTED = "nested quantifier"
+ALTERNATION = "quantified alternation with overlapping branches"
+ADJACENT = "adjacent quantifiers with overlapping characters"
+
+# characters used to approximate character sets of regular expressions
+ALPHABET = frozenset(range(128))
+# repeats with upper bound at least that large are considered unbounded
+LARGE_REPEAT = 100
+REPEATS = (c.MAX_REPEAT, c.MIN_REPEAT)
+# runtime check results faster than that are never considered slow
+FAST = 0.01
+
+_CATEGORIES = {
+    c.CATEGORY_DIGIT: lambda x: chr(x).isdigit(),
+    c.CATEGORY_SPACE: lambda x: chr(x).isspace(),
+    c.CATEGORY_WORD: lambda x: chr(x).isalnum() or x == ord("_"),
+}
+_NEGATED = {
+    c.CATEGORY_NOT_DIGIT: c.CATEGORY_DIGIT,
+    c.CATEGORY_NOT_SPACE: c.CATEGORY_SPACE,
+    c.CATEGORY_NOT_WORD: c.CATEGORY_WORD,
+}
+# preferred pump and suffix characters for adversarial inputs
+_PUMPS = "a0A _-.=/:@\t"
+_SUFFIXES = "!\x00#~\"' a"
+
+# attack is a (prefix, pump, suffix) tuple, input is prefix + pump * n + suffix
+Attack = Tuple[str, str, str]
+
+
+@attr.s(frozen=True)
+class Risk(Model):
+    """Risk holds a single super-linear backtracking finding.
+
+    Attributes
+    ----------
+    kind (str)
+    : Either `exponential` or `polynomial`.
+
+    message (str)
+    : Short explanation of the risky construct.
+
+    """
+
+    kind: str = attr.ib()
+    message: str = attr.ib()
+
+
+@attr.s(frozen=True)
+class Report(Model):
+    """Report holds results of measuring rule against adversarial inputs.
+
+    Attributes
+    ----------
+    id (str)
+    : Rule ID.
+
+    input (str)
+    : Description of the slowest input as `prefix + pump * n + suffix`.
+
+    length (int)
+    : Length of the slowest input.
+
+    time (float)
+    : Time spent on the slowest input, in seconds.
+
+    order (float, optional)
+    : Estimated polynomial order of growth, e.g. 1 for linear rules.
+
+    timeout (bool)
+    : Whether rule failed to process the slowest input within time limit.
+
+    """
+
+    id: str = attr.ib()
+    input: str = attr.ib("")
+    length: int = attr.ib(0)
+    time: float = attr.ib(0.0)
+    order: Optional[float] = attr.ib(None)
+    timeout: bool = attr.ib(False)
+
+    @property
+    def ok(self) -> bool:
+        """Return true if rule is fast enough or considered linear."""
+        if self.timeout:
+            return False
+        return self.time < FAST or self.order is None or self.order < 1.5
+
+
+def analyse(pattern: str) -> List[Risk]:
+    r"""Statically analyse pattern for super-linear backtracking risks.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> analyse("AKIA[0-9A-Z]{16}")
+    []
+    >>> analyse("(a+)+$")
+    [Risk(kind='exponential', message='nested quantifier')]
+    >>> [r.kind for r in analyse(r"(\w+\s?)*!")]
+    ['exponential']
+    >>> [r.kind for r in analyse(r"(\w|\d\w)*!")]
+    ['exponential']
+    >>> [r.kind for r in analyse(r"\d+\w+!")]
+    ['polynomial']
+    >>> [r.kind for r in analyse("(a|a)*b")]
+    ['exponential']
+    >>> [r.kind for r in analyse("(a|aa)+b")]
+    ['exponential']
+    >>> [r.kind for r in analyse("(x+x+)+y")]
+    ['exponential']
+    >>> analyse("(?>a+)+") + analyse("(a++)+")
+    []
+
+    """
+    parsed = sre.parse(pattern)
+    ignorecase = bool(parsed.state.flags & re.IGNORECASE)
+    risks = []
+    _analyse(parsed, ignorecase, risks, inside=None)
+    return list(dict.fromkeys(risks))
+
+
+def attacks(pattern: str) -> List[Attack]:
+    """Return adversarial inputs for the given pattern.
+
+    Note
+    ----
+    Each unbounded quantifier produces an input which reaches the quantifier,
+    pumps it with the characters it accepts and then fails to match.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> attacks("key-[0-9]+")
+    [('key-', '0', '!')]
+
+    """
+    parsed = sre.parse(pattern)
+    ignorecase = bool(parsed.state.flags & re.IGNORECASE)
+    found = []
+    _attacks(parsed, "", ignorecase, found, _used(parsed, ignorecase))
+
+    if not found:
+        found.append(("", _PUMPS[0], _SUFFIXES[0]))
+
+    return list(dict.fromkeys(found))
+
+
+def check(
+    rules: Iterable[Pattern],
+    timeout: float = 2.0,
+    maxlen: int = 65536,
+) -> List[Report]:
+    """Measure rules against adversarial inputs and return worst cases.
+
+    Note
+    ----
+    Each rule is measured in a separate process,
+    which is killed if the rule does not finish within `timeout` seconds.
+
+    """
+    return [_check(r, timeout, maxlen) for r in rules]
+
+
+def text(reports: Iterable[Report]) -> str:
+    """Render runtime check reports as table.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> print(text([Report("rule-1", "'' + 'a' * 64 + '!'", 65, 0.5)]))
+    rule                     status      time  order  input
+    rule-1                   ok        0.5000      -  '' + 'a' * 64 + '!'
+
+    """
+    rows = [
+        "%-24s %-7s %8s %6s  %s" % ("rule", "status", "time", "order", "input")
+    ]
+    for r in reports:
+        status = "timeout" if r.timeout else "ok" if r.ok else "slow"
+        order = "-" if r.order is None else "%.1f" % r.order
+        rows.append(
+            "%-24s %-7s %8.4f %6s  %s" % (r.id, status, r.time, order, r.input)
+        )
+
+    return "\n".join(rows)
+
+
+def _check(rule: Pattern, timeout: float, maxlen: int) -> Report:
+    # pipe is used instead of queue, since queue relies on a feeder thread,
+    # which is never scheduled while the main thread is stuck in regex engine
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_measure,
+        args=(rule, attacks(rule.pattern), maxlen, sender),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+
+    deadline = time.monotonic() + timeout
+    worst = Report(rule.id)
+    started = None
+
+    while receiver.poll(max(deadline - time.monotonic(), 0)):
+        try:
+            item = receiver.recv()
+        except EOFError:  # pragma: no cover
+            break
+
+        if item is None:
+            started = None
+            break
+
+        input, length, elapsed, order = item
+        if elapsed is None:
+            started = (input, length)
+        elif elapsed >= worst.time:
+            started = None
+            worst = Report(rule.id, input, length, elapsed, order)
+
+    process.terminate()
+    process.join()
+    receiver.close()
+
+    if started is not None:
+        input, length = started
+        return Report(
+            rule.id, input, length, float(timeout), worst.order, True
+        )
+
+    return worst
+
+
+def _measure(rule: Pattern, found: List[Attack], maxlen: int, conn):
+    """Measure rule against attacks with growing length and report results.
+
+    Note
+    ----
+    Started inputs are reported before measuring them,
+    so that the parent process knows which input caused the timeout.
+
+    """
+    for prefix, pump, suffix in found:
+        prev = None
+        n = 64
+        while len(prefix) + len(pump) * n + len(suffix) <= maxlen:
+            s = prefix + pump * n + suffix
+            input = f"{prefix!r} + {pump!r} * {n} + {suffix!r}"
+            conn.send((input, len(s), None, None))
+
+            start = time.perf_counter()
+            rule.findall(s)
+            elapsed = time.perf_counter() - start
+
+            order = None
+            if prev and prev > 1e-4 and elapsed > prev:
+                order = math.log(elapsed / prev, 4)
+            conn.send((input, len(s), elapsed, order))
+
+            prev = elapsed
+            n *= 4
+
+    conn.send(None)
+
+
+def _analyse(parsed, ignorecase, risks, inside):
+    """Walk parsed pattern and collect risks.
+
+    Note
+    ----
+    `inside` is the enclosing unbounded repeat body, if any.
+
+    """
+    items = list(parsed)
+    for i, (op, av) in enumerate(items):
+        if op in REPEATS:
+            low, high, body = av
+            unbounded = high == c.MAXREPEAT or high >= LARGE_REPEAT
+            if unbounded and _pumpable(body, ignorecase):
+                if inside is not None and _alone(inside, body, ignorecase):
+                    risks.append(Risk(EXPONENTIAL, NESTED))
+                if _ambiguous(body, ignorecase):
+                    risks.append(Risk(EXPONENTIAL, ALTERNATION))
+                j = _adjacent(items, i, ignorecase)
+                if j is not None:
+                    other = items[j][1][2]
+                    if inside is not None and _alone(
+                        inside, body, ignorecase, other
+                    ):
+                        risks.append(Risk(EXPONENTIAL, ADJACENT))
+                    else:
+                        risks.append(Risk(POLYNOMIAL, ADJACENT))
+                _analyse(body, ignorecase, risks, inside=body)
+            else:
+                _analyse(body, ignorecase, risks, inside)
+        elif op == c.POSSESSIVE_REPEAT or op == c.ATOMIC_GROUP:
+            continue
+        else:
+            for sub in _children(op, av):
+                flags = _flags(op, av, ignorecase)
+                _analyse(sub, flags, risks, inside)
+
+
+def _attacks(parsed, prefix, ignorecase, found, used):
+    items = list(parsed)
+    for i, (op, av) in enumerate(items):
+        if op in REPEATS + (c.POSSESSIVE_REPEAT,):
+            low, high, body = av
+            chars = _first(body, ignorecase)
+            if chars and (high == c.MAXREPEAT or high >= LARGE_REPEAT):
+                pump = _pick(chars, _PUMPS)
+                suffix = _suffix(used, items[i + 1 :], chars, ignorecase)
+                found.append((prefix, pump, suffix))
+                _attacks(body, prefix, ignorecase, found, used)
+        else:
+            for sub in _children(op, av):
+                flags = _flags(op, av, ignorecase)
+                _attacks(sub, prefix, flags, found, used)
+
+        prefix += _witness([(op, av)], ignorecase)
+
+
+def _children(op, av) -> list:
+    """Return nested subpatterns of the given item."""
+    if op == c.SUBPATTERN:
+        return [av[3]]
+    if op == c.BRANCH:
+        return av[1]
+    if op in (c.ASSERT, c.ASSERT_NOT):
+        return [av[1]]
+    if op == c.GROUPREF_EXISTS:
+        return [p for p in av[1:] if p is not None]
+    return []
+
+
+def _flags(op, av, ignorecase: bool) -> bool:
+    """Return case-insensitivity flag for nested subpattern."""
+    if op != c.SUBPATTERN:
+        return ignorecase
+    _, add, remove, _ = av
+    if add & re.IGNORECASE:
+        return True
+    if remove & re.IGNORECASE:
+        return False
+    return ignorecase
+
+
+def _pumpable(parsed, ignorecase: bool) -> bool:
+    """Return true if subpattern can match a non-empty string."""
+    return bool(_first(parsed, ignorecase))
+
+
+def _nullable(parsed) -> bool:
+    """Return true if subpattern can match an empty string."""
+    for op, av in parsed:
+        if op in REPEATS + (c.POSSESSIVE_REPEAT,):
+            if av[0] > 0 and not _nullable(av[2]):
+                return False
+        elif op == c.SUBPATTERN:
+            if not _nullable(av[3]):
+                return False
+        elif op == c.ATOMIC_GROUP:
+            if not _nullable(av):
+                return False
+        elif op == c.BRANCH:
+            if not any(_nullable(b) for b in av[1]):
+                return False
+        elif op in (c.LITERAL, c.NOT_LITERAL, c.ANY, c.IN):
+            return False
+    return True
+
+
+def _alone(outer, inner, ignorecase: bool, other=None) -> bool:
+    """Return true if `inner` repeat can pump `outer` body on its own.
+
+    Note
+    ----
+    This is the case when all the other items of `outer` are nullable,
+    e.g. `(a+)+` or `(a+b?)+`, but not `(a+b)+`. The `other` repeat, if
+    given, is allowed as well, e.g. `(a+a+)+`.
+
+    """
+    items = list(outer)
+    if len(items) == 1 and items[0][0] in (c.SUBPATTERN, c.BRANCH):
+        op, av = items[0]
+        subs = [av[3]] if op == c.SUBPATTERN else av[1]
+        return any(_alone(s, inner, ignorecase, other) for s in subs)
+
+    for op, av in items:
+        if op in REPEATS and (av[2] is inner or av[2] is other):
+            continue
+        if op == c.SUBPATTERN and _alone(av[3], inner, ignorecase, other):
+            continue
+        if not _nullable([(op, av)]):
+            return False
+
+    return any(_contains(item, inner) for item in items)
+
+
+def _contains(item, inner) -> bool:
+    op, av = item
+    if op in REPEATS:
+        return av[2] is inner
+    return any(_contains(i, inner) for s in _children(op, av) for i in s)
+
+
+def _ambiguous(parsed, ignorecase: bool) -> bool:
+    """Return true if repeated body has alternatives with common prefix.
+
+    Note
+    ----
+    Parser factors common prefix out of alternatives, e.g. `(a|aa)` becomes
+    `a(|a)`, so alternatives are compared together with the rest of the body
+    and the next repetition which follows them.
+
+    """
+    items = list(parsed)
+    while len(items) == 1 and items[0][0] == c.SUBPATTERN:
+        items = list(items[0][1][3])
+
+    for k, (op, av) in enumerate(items):
+        if op != c.BRANCH:
+            continue
+
+        rest = items[k + 1 :] + items
+        seen = set()
+        for branch in av[1]:
+            chars = _first(list(branch) + rest, ignorecase)
+            if seen & chars:
+                return True
+            seen |= chars
+
+    return False
+
+
+def _adjacent(items, i, ignorecase: bool) -> Optional[int]:
+    """Return index of overlapping unbounded repeat following the repeat."""
+    chars = _first(items[i][1][2], ignorecase)
+    for j in range(i + 1, len(items)):
+        op, av = items[j]
+        if op in REPEATS and (av[1] == c.MAXREPEAT or av[1] >= LARGE_REPEAT):
+            if chars & _first(av[2], ignorecase):
+                return j
+        if not _nullable([(op, av)]):
+            return None
+
+    return None
+
+
+def _first(parsed, ignorecase: bool) -> frozenset:
+    """Return characters which can start a match of the subpattern."""
+    chars = set()
+    for op, av in parsed:
+        if op in (c.LITERAL, c.NOT_LITERAL, c.ANY, c.IN):
+            return frozenset(chars | _charset(op, av, ignorecase))
+        if op in REPEATS + (c.POSSESSIVE_REPEAT,):
+            if av[1] > 0:
+                chars |= _first(av[2], ignorecase)
+        elif op == c.SUBPATTERN:
+            chars |= _first(av[3], _flags(op, av, ignorecase))
+        elif op == c.ATOMIC_GROUP:
+            chars |= _first(av, ignorecase)
+        elif op == c.BRANCH:
+            for branch in av[1]:
+                chars |= _first(branch, ignorecase)
+        elif op == c.GROUPREF:
+            return ALPHABET
+
+        if not _nullable([(op, av)]):
+            break
+
+    return frozenset(chars)
+
+
+def _charset(op, av, ignorecase: bool) -> frozenset:
+    """Return characters matched by a single character item."""
+    if op == c.ANY:
+        chars = ALPHABET - {ord("\n")}
+    elif op == c.LITERAL:
+        chars = {av}
+    elif op == c.NOT_LITERAL:
+        chars = ALPHABET - {av}
+    else:
+        chars = set()
+        negate = False
+        for iop, iav in av:
+            if iop == c.NEGATE:
+                negate = True
+            elif iop == c.LITERAL:
+                chars.add(iav)
+            elif iop == c.RANGE:
+                chars |= set(range(iav[0], iav[1] + 1))
+            elif iop == c.CATEGORY and iav in _NEGATED:
+                chars |= ALPHABET - _category(_NEGATED[iav])
+            elif iop == c.CATEGORY:
+                chars |= _category(iav)
+        if negate:
+            chars = ALPHABET - chars
+
+    chars = frozenset(chars) & ALPHABET
+    if ignorecase:
+        chars |= {ord(chr(x).swapcase()) for x in chars} & ALPHABET
+
+    return frozenset(chars)
+
+
+def _category(category) -> frozenset:
+    match = _CATEGORIES.get(category, lambda x: False)
+    return frozenset(x for x in ALPHABET if match(x))
+
+
+def _witness(parsed, ignorecase: bool) -> str:
+    """Return the shortest string matching the subpattern, approximately."""
+    s = ""
+    for op, av in parsed:
+        if op in (c.LITERAL, c.NOT_LITERAL, c.ANY, c.IN):
+            chars = _charset(op, av, ignorecase)
+            s += _pick(chars, _PUMPS) if chars else ""
+        elif op in REPEATS + (c.POSSESSIVE_REPEAT,):
+            s += _witness(av[2], ignorecase) * av[0]
+        elif op == c.SUBPATTERN:
+            s += _witness(av[3], _flags(op, av, ignorecase))
+        elif op == c.ATOMIC_GROUP:
+            s += _witness(av, ignorecase)
+        elif op == c.BRANCH:
+            s += _witness(av[1][0], ignorecase)
+    return s
+
+
+def _suffix(used, rest, chars, ignorecase: bool) -> str:
+    """Return character which fails the match after pumped repeat.
+
+    Note
+    ----
+    Characters not used anywhere in the pattern are preferred,
+    new lines are never used since rules are applied to single lines.
+
+    """
+    allowed = ALPHABET - {ord("\n")}
+    for avoid in (used, _first(rest, ignorecase) | chars):
+        if allowed - avoid:
+            return _pick(allowed - avoid, _SUFFIXES)
+    return ""
+
+
+def _used(parsed, ignorecase: bool) -> frozenset:
+    """Return all characters used in the subpattern."""
+    chars = set()
+    for op, av in parsed:
+        if op in (c.LITERAL, c.NOT_LITERAL, c.ANY, c.IN):
+            chars |= _charset(op, av, ignorecase)
+        elif op in REPEATS + (c.POSSESSIVE_REPEAT,):
+            chars |= _used(av[2], ignorecase)
+        elif op == c.ATOMIC_GROUP:
+            chars |= _used(av, ignorecase)
+        else:
+            for sub in _children(op, av):
+                chars |= _used(sub, _flags(op, av, ignorecase))
+    return frozenset(chars)
+
+
+def _pick(chars: frozenset, preferred: str) -> str:
+    """Return preferred character from set if possible."""
+    for ch in preferred:
+        if ord(ch) in chars:
+            return ch
+    return chr(min(chars)) if chars else ""
@@ -1,15 +1,17 @@
 """Render reports in all supported formats."""
 
-import jinja2
 import json as jsonlib
 
 from collections import defaultdict
 from typing import Any, Dict, Iterable, Tuple
 
 from trufflehog3 import STATIC_DIR, HTML_TEMPLATE_FILE, TEXT_TEMPLATE_FILE
+from trufflehog3 import helper
 from trufflehog3.helper import Color
 from trufflehog3.models import Issue, Severity, Pattern  # noqa: F401 doctest
 
+jinja2 = helper.lazy("jinja2")
+
 
 def text(issues: Iterable[Issue]) -> str:
     """Render issues as text.
@@ -1,13 +1,33 @@
 """Supported search algorithms."""
 
-from typing import Iterable, Iterator, Optional, Union
+import attr
+import os
+import re
+import time
+import uuid
+
+from typing import (
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Union,
+)
 
 from trufflehog3 import NOSECRET_INLINE_RE, IGNORE_NOSECRET
 from trufflehog3 import helper, log, source
 from trufflehog3.models import Entropy, Exclude, File, Issue, Pattern
+from trufflehog3.stats import Metrics, Profile
 
 MATCH_ALL_RULE_IDS = "*"
 
+# globs which only depend on file name, e.g. `**/*.min.js` or `**/go.sum`
+NAME_GLOB_RE = re.compile(r"^\*\*/([^/*?\[\]]+)$")
+SUFFIX_GLOB_RE = re.compile(r"^\*\*/\*(\.[^/*?\[\]]+)$")
+
 
 def search(
     file: File,
@@ -15,6 +35,10 @@ def search(
     exclude: Iterable[Exclude] = None,
     ignore_nosecret: bool = IGNORE_NOSECRET,
     context: int = 0,
+    baseline: Container[uuid.UUID] = None,
+    profile: Profile = None,
+    metrics: Metrics = None,
+    limit: int = None,
 ) -> Iterable[Issue]:
     """Return issues found using provided rules.
 
@@ -69,8 +93,40 @@ def search(
     >>> len(search(file, [rule]))
     0
 
+    With baseline of already known issues
+
+    >>> file = File(path="/path/to/code.py", content="password = 'letmein'")
+    >>> known = {issue.id for issue in search(file, [rule])}
+    >>> len(search(file, [rule], baseline=known))
+    0
+
+    With content being a part of a larger file
+
+    >>> file = File(path="code.py", content="password = 'letmein'", offset=9)
+    >>> [issue.line for issue in search(file, [rule])]
+    ['10']
+
+    With limit of issues per rule
+
+    >>> file = File(path="code.py", content="letmein\\nletmein\\nLetMeIn")
+    >>> rule = Pattern(id="letmein", message="", pattern="(?i)letmein")
+    >>> [(i.secret, i.suppressed) for i in search(file, [rule], limit=1)]
+    [('letmein', 1)]
+
     """
-    return list(searchiter(file, rules, exclude, ignore_nosecret, context))
+    return list(
+        searchiter(
+            file,
+            rules,
+            exclude,
+            ignore_nosecret,
+            context,
+            baseline,
+            profile,
+            metrics,
+            limit,
+        )
+    )
 
 
 def searchiter(
@@ -79,12 +135,49 @@ def searchiter(
     exclude: Iterable[Exclude] = None,
     ignore_nosecret: bool = IGNORE_NOSECRET,
     context: int = 0,
+    baseline: Container[uuid.UUID] = None,
+    profile: Profile = None,
+    metrics: Metrics = None,
+    limit: int = None,
 ) -> Iterator[Issue]:
-    """Yield issues found using provided rules."""
+    """Yield issues found using provided rules.
+
+    Note
+    ----
+    Issues with IDs present in `baseline` are dropped before instantiation.
+
+    If `limit` is set, at most that many distinct issues are yielded per rule.
+    Further distinct issues are only counted in `suppressed` of the last
+    yielded one, which is held back until the whole file is searched. Limit
+    applies to `file` as given, i.e. to each part of a split diff or stream.
+
+    If `profile` is set, per-rule stats are collected into it.
+    If `metrics` is set, search counters are collected into it.
+
+    Rules not applicable to file path are resolved before reading the file,
+    pass `RuleIndex` to avoid building it for every file.
+
+    """
+    if not isinstance(rules, RuleIndex):
+        rules = RuleIndex(rules)
+
+    rules = rules.resolve(file.path)
+    if not rules:
+        return
+
     content = file.read()
+    lines = content.splitlines()
+
+    if metrics is not None:
+        metrics.bytes += len(content)
+        metrics.lines += len(lines)
 
-    for i, line in enumerate(content.splitlines()):
-        line_number = i + 1
+    counts: Dict[str, int] = {}
+    capped: Dict[str, Issue] = {}
+    found: Set[uuid.UUID] = set()
+
+    for i, line in enumerate(lines):
+        line_number = i + 1 + file.offset
         exclude_ids = [] if ignore_nosecret else _parse_nosecret(line)
         location = f"{file.path}:{line_number}"
 
@@ -97,13 +190,35 @@ def searchiter(
                 log.info(f"nosecret: skipping {rule.id} in {location}")
                 continue
 
-            for match in rule.findall(line):
+            if profile is None:
+                matches = rule.findall(line)
+            else:
+                stats = profile.rule(rule.id)
+                start = time.perf_counter()
+                matches = rule.findall(line)
+                stats.time += time.perf_counter() - start
+                stats.lines += 1
+                stats.bytes += len(line)
+                stats.matches += len(matches)
+
+            if metrics is not None:
+                metrics.matches += len(matches)
+
+            for match in matches:
+                id = Issue.genid(rule, file.path, match)
+                if baseline is not None and id in baseline:
+                    log.debug(f"baseline: skipping {rule.id} in {location}")
+                    continue
+
                 issue = Issue(
+                    id=id,
                     rule=rule,
                     path=file.path,
                     line=str(line_number),
                     secret=match,
-                    context=helper.get_lines(content, line_number, context),
+                    context=helper.get_lines(
+                        lines, i + 1, context, file.offset
+                    ),
                     branch=file.branch,
                     message=file.message,
                     author=file.author,
@@ -113,10 +228,112 @@ def searchiter(
 
                 if _match(issue, exclude):
                     log.info(f"exclude: skipping {rule.id} in {location}")
+                    if profile is not None:
+                        stats.excluded += 1
+                    if metrics is not None:
+                        metrics.excluded += 1
                     continue
 
+                if limit:
+                    # repeated matches of the same secret are a single issue
+                    if id in found:
+                        continue
+                    found.add(id)
+                    count = counts[rule.id] = counts.get(rule.id, 0) + 1
+                    if count > limit:
+                        if metrics is not None:
+                            metrics.suppressed += 1
+                        continue
+                    if count == limit:
+                        capped[rule.id] = issue
+                        continue
+
                 yield issue
 
+    for rule_id, issue in capped.items():
+        suppressed = counts[rule_id] - limit
+        if suppressed:
+            log.info(f"limit: {suppressed} more {rule_id} in {file.path}")
+            issue = attr.evolve(issue, suppressed=suppressed)
+        yield issue
+
+
+class RuleIndex(List[Union[Entropy, Pattern]]):
+    """RuleIndex resolves rules applicable to file path by `paths` globs.
+
+    Note
+    ----
+    Globs depending on file name only, e.g. `**/go.sum` or `**/*.min.js`,
+    are looked up by name and extensions. Other globs are matched against
+    every path.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> r1 = Pattern(id="r1", message="r1", pattern="x")
+    >>> r2 = Pattern(id="r2", message="r2", pattern="x", paths=["**/*.py"])
+    >>> r3 = Entropy(exclude_paths=["**/*.min.js", "**/.env", "vendor/**"])
+    >>> index = RuleIndex([r1, r2, r3])
+    >>> [r.id for r in index.resolve("src/app.py")]
+    ['r1', 'r2', 'high-entropy']
+    >>> [r.id for r in index.resolve("static/app.min.js")]
+    ['r1']
+    >>> [r.id for r in index.resolve("vendor/lib.py")]
+    ['r1', 'r2']
+    >>> [r.id for r in index.resolve("prod.env")]
+    ['r1', 'high-entropy']
+
+    """
+
+    INCLUDE = "paths"
+    EXCLUDE = "exclude_paths"
+
+    def __init__(self, rules: Iterable[Union[Entropy, Pattern]] = ()):
+        """Build index of path globs."""
+        super().__init__(rules)
+        self._names: Dict[str, List[tuple]] = {}
+        self._suffixes: Dict[str, List[tuple]] = {}
+        self._globs: List[tuple] = []
+        for i, rule in enumerate(self):
+            for kind in (self.INCLUDE, self.EXCLUDE):
+                for glob in getattr(rule, f"_{kind}", None) or []:
+                    name = NAME_GLOB_RE.match(glob)
+                    suffix = SUFFIX_GLOB_RE.match(glob)
+                    if name:
+                        key = name.group(1)
+                        self._names.setdefault(key, []).append((i, kind))
+                    elif suffix:
+                        key = suffix.group(1)
+                        self._suffixes.setdefault(key, []).append((i, kind))
+                    else:
+                        self._globs.append((i, kind, glob))
+
+    def resolve(self, path: str) -> List[Union[Entropy, Pattern]]:
+        """Return rules applicable to the given path."""
+        if not (self._names or self._suffixes or self._globs):
+            return self
+
+        name = os.path.basename(path)
+        hits = set(self._names.get(name, ()))
+        if self._suffixes:
+            for j, char in enumerate(name):
+                if char == ".":
+                    hits.update(self._suffixes.get(name[j:], ()))
+
+        for i, kind, glob in self._globs:
+            if source._match(path, [glob]):
+                hits.add((i, kind))
+
+        return [
+            rule
+            for i, rule in enumerate(self)
+            if (i, self.EXCLUDE) not in hits
+            and (
+                not getattr(rule, "_paths", None) or (i, self.INCLUDE) in hits
+            )
+        ]
+
 
 def _parse_nosecret(s: str) -> Iterable[str]:
     """Parse `nosecret` comment from string and return excluded rule IDs.
@@ -1,14 +1,66 @@
 """Supported search sources."""
 
-import git
+import functools
+import glob as globlib
+import hashlib
+import io
+import itertools
 import os
-
-from pathlib import Path
-from typing import Iterable, Iterator, Optional
+import re
+import subprocess
+
+from pathlib import Path, PurePosixPath
+from typing import (
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+)
 
 from trufflehog3 import DEFAULT_EXCLUDE_SET
-from trufflehog3 import log
-from trufflehog3.models import File
+from trufflehog3 import helper, log
+from trufflehog3.models import Commit, File
+from trufflehog3.stats import Metrics
+
+futures = helper.lazy("concurrent.futures")
+git = helper.lazy("git")
+tarfile = helper.lazy("tarfile")
+zipfile = helper.lazy("zipfile")
+
+HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)")
+QUOTED_RE = re.compile(rb"\\([0-7]{3}|.)", re.DOTALL)
+QUOTED_ESCAPES = {
+    b"a": b"\a",
+    b"b": b"\b",
+    b"f": b"\f",
+    b"n": b"\n",
+    b"r": b"\r",
+    b"t": b"\t",
+    b"v": b"\v",
+}
+
+LOG_FORMAT = "%x1e%H%x1f%P%x1f%an <%ae>%x1f%cI%x1f%B%x1f"
+DIFF_CHUNK_SIZE = 1 << 20
+
+STREAM_TARGET = "-"
+STREAM_PATH = "<stdin>"
+STREAM_CHUNK_SIZE = 1 << 20
+
+ARCHIVE_SEP = "!/"
+ARCHIVE_DEPTH = 3
+ARCHIVE_MEMBER_SIZE = 64 << 20
+ARCHIVE_MAGIC = (
+    (0, b"PK\x03\x04"),  # zip, jar, wheel
+    (0, b"\x1f\x8b"),  # gzip
+    (0, b"BZh"),  # bzip2
+    (0, b"\xfd7zXZ\x00"),  # xz
+    (257, b"ustar"),  # tar
+)
 
 
 def dirlist(path: str, exclude: Iterable[str] = None) -> Iterable[File]:
@@ -25,36 +77,192 @@ def dirlist(path: str, exclude: Iterable[str] = None) -> Iterable[File]:
     return list(diriter(path, exclude))
 
 
-def diriter(path: str, exclude: Iterable[str] = None) -> Iterator[File]:
-    """Recursively iterate over directory and yield existing files."""
+def diriter(
+    path: str,
+    exclude: Iterable[str] = None,
+    metrics: Metrics = None,
+    workers: int = None,
+    blobs: Dict[str, str] = None,
+) -> Iterator[File]:
+    """Recursively iterate over directory and yield existing files.
+
+    Note
+    ----
+    Directories are scanned concurrently by up to `workers` threads, which
+    helps a lot on slow network filesystems. Files are yielded as soon as
+    their directory is scanned, thus the order is not deterministic.
+
+    Symlinks are skipped and never followed.
+
+    Files found in `blobs` mapping of paths to Git blob IDs get their `blob`
+    set, see `source.gitblobs`.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> sorted(f.path for f in diriter("tests", exclude=["**/*.yml"]))
+    ['data/test_file.txt']
+
+    """
     exclude_set = DEFAULT_EXCLUDE_SET | set(exclude or [])
-    # Using `os.walk` here since it allows to drop whole directories.
-    # `Path.rglob` requires checking every file against exclude rules.
+    # Excluded directories are dropped as a whole instead of matching every
+    # file in them against exclude rules, like `Path.rglob` would require.
     # This helps to save a lot of time when excluding large directories.
-    for dirpath, dirnames, filenames in os.walk(path):
-        rel = Path(dirpath).relative_to(path)
+    with futures.ThreadPoolExecutor(workers) as executor:
+        scan = functools.partial(
+            _scandir, path, exclude_set=exclude_set, blobs=blobs
+        )
+        pending = {executor.submit(scan, "")}
+        while pending:
+            done, pending = futures.wait(
+                pending, return_when=futures.FIRST_COMPLETED
+            )
+            for future in done:
+                files, dirs, skipped = future.result()
+                for d in dirs:
+                    pending.add(executor.submit(scan, d))
+
+                if metrics is not None:
+                    metrics.files += len(files)
+                    metrics.skipped += skipped
+
+                yield from files
 
-        for directory in dirnames[:]:
-            dirname = rel / directory
-            pattern = _match(dirname, exclude_set)
-            if pattern:
-                log.debug(f"skipping directory '{dirname}': '{pattern}'")
-                dirnames.remove(directory)
 
-        for file in filenames:
-            filename = rel / file
-            if filename.is_symlink():  # pragma: no cover
+def _scandir(
+    root: str,
+    rel: str,
+    exclude_set: Iterable[str],
+    blobs: Dict[str, str] = None,
+) -> Tuple[List[File], List[str], int]:
+    """Scan single directory and return files, subdirectories to be scanned
+    and number of skipped entries.
+
+    Note
+    ----
+    File types are taken from `os.DirEntry`, which avoids extra `stat` calls.
+
+    """
+    files, dirs, skipped = [], [], 0
+    try:
+        it = os.scandir(os.path.join(root, rel))
+    except OSError as e:  # pragma: no cover
+        log.warning(f"skipping directory '{rel}': {e}")
+        return files, dirs, skipped
+
+    with it:
+        for entry in it:
+            name = f"{rel}/{entry.name}" if rel else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                pattern = _match(name, exclude_set)
+                if pattern:
+                    log.debug(f"skipping directory '{name}': '{pattern}'")
+                    skipped += 1
+                else:
+                    dirs.append(name)
                 continue
 
-            pattern = _match(filename, exclude_set)
+            if not entry.is_file(follow_symlinks=False):
+                continue
+
+            pattern = _match(name, exclude_set)
             if pattern:
-                log.debug(f"skipping file '{filename}': '{pattern}'")
+                log.debug(f"skipping file '{name}': '{pattern}'")
+                skipped += 1
                 continue
 
-            yield File(
-                path=filename.as_posix(),
-                real=(path / filename).as_posix(),
-            )
+            blob = blobs.get(name) if blobs else None
+            files.append(File(path=name, real=entry.path, blob=blob))
+
+    return files, dirs, skipped
+
+
+def gitblobs(path: str) -> Dict[str, str]:
+    """Return Git blob IDs of tracked files unchanged in working tree.
+
+    Note
+    ----
+    Blob IDs are taken from the index, files reported as modified by
+    `git diff-files`, which compares index stat data, are left out.
+    Files flagged assume-unchanged or skip-worktree are never reported as
+    modified, thus their blob IDs are computed from the working tree.
+    Return empty mapping if path is not a Git repository root.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> gitblobs("trufflehog3")
+    {}
+
+    """
+    if not _is_repo(path):
+        return {}
+
+    try:
+        staged = _git(path, "ls-files", "-v", "--stage", "-z")
+        modified = _git(path, "diff-files", "--name-only", "-z")
+    except (OSError, subprocess.CalledProcessError) as e:  # pragma: no cover
+        log.warning(f"reading Git index: {e}")
+        return {}
+
+    blobs, untrusted = {}, []
+    for entry in staged.split("\0"):
+        if not entry:
+            continue
+        info, name = entry.split("\t", 1)
+        tag, mode, blob, stage = info.split()
+        # skip submodules, symlinks and merge conflicts
+        if stage != "0" or not mode.startswith("100"):
+            continue
+        # lowercase tags are assume-unchanged, `S` is skip-worktree
+        if tag.islower() or tag == "S":
+            untrusted.append(name)
+        else:
+            blobs[name] = blob
+
+    for name in modified.split("\0"):
+        blobs.pop(name, None)
+
+    blobs.update(_hashobjects(path, untrusted))
+    return blobs
+
+
+def _hashobjects(path: str, names: List[str]) -> Dict[str, str]:
+    """Return Git blob IDs of working tree files, skipping missing ones."""
+    names = [
+        n
+        for n in names
+        if "\n" not in n and os.path.isfile(os.path.join(path, n))
+    ]
+    if not names:
+        return {}
+
+    try:
+        proc = subprocess.run(
+            ["git", "hash-object", "--stdin-paths"],
+            cwd=path,
+            input="\n".join(names).encode(),
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:  # pragma: no cover
+        log.warning(f"hashing files: {e}")
+        return {}
+
+    return dict(zip(names, proc.stdout.decode().split()))
+
+
+def _git(path: str, *args: str) -> str:
+    """Run Git command in path and return its output."""
+    proc = subprocess.run(
+        ["git", "-c", "core.quotepath=off", *args],
+        cwd=path,
+        capture_output=True,
+        check=True,
+    )
+    return proc.stdout.decode("utf-8", errors="replace")
 
 
 def gitlist(
@@ -92,100 +300,565 @@ def gititer(
     branch: str = None,
     depth: int = None,
     since: str = None,
+    metrics: Metrics = None,
 ) -> Iterator[File]:
-    """Iterate over Git commit history and yield diff blobs for each file."""
+    """Iterate over Git commit history and yield diff blobs for each file.
+
+    Note
+    ----
+    Commit graph of all branches is walked once by a single `git log`, thus
+    shared history is never diffed twice. Each commit is diffed against its
+    parent, root commits against the empty tree. Merge commits only yield
+    hunks which differ from all of their parents (combined diff), e.g.
+    conflict resolutions. Every scanned branch containing the commit is
+    recorded in `branch`.
+
+    At most `depth` commits are walked in total. Commits reachable from
+    `since` are not walked.
+
+    """
+    if not _is_repo(path):
+        log.warning("not a Git repository: %s", path)
+        return
+
     try:
         repo = git.Repo(path)
     except Exception:  # pragma: no cover
         log.warning("not a Git repository: %s", path)
         return
 
-    already_searched = set()
-    for branch in _get_branches(repo, branch):
-        log.info(f"switching to branch '{branch}'")
-        prev_commit = None
-        since_reached = False
-        commits = repo.iter_commits(branch, max_count=depth)
+    tips = {}
+    for ref in _get_branches(repo, branch):
+        name = ref.name.split("/")[-1]
+        tips.setdefault(ref.commit.hexsha, set()).add(name)
+
+    args = [
+        "log",
+        "--topo-order",
+        "--root",
+        "--cc",
+        "--no-color",
+        "--no-ext-diff",
+        f"--format={LOG_FORMAT}",
+        *tips,
+    ]
+    if depth:
+        args.append(f"--max-count={depth}")
+    if since:
+        args.append(f"^{since}")
+
+    yield from _patchiter(_gitlines(path, *args), tips, exclude, metrics)
+
+
+def _patchiter(
+    lines: Iterable[str],
+    tips: Dict[str, Set[str]],
+    exclude: Iterable[str] = None,
+    metrics: Metrics = None,
+    size_limit: int = DIFF_CHUNK_SIZE,
+) -> Iterator[File]:
+    r"""Parse `git log` patches and yield diffs for each file.
 
-        for curr_commit in commits:
-            if curr_commit.hexsha == since:
-                since_reached = True
+    Note
+    ----
+    Commits must come in topological order, i.e. children before parents,
+    so that branches containing a commit are known once it is reached.
+    Deleted and binary files are skipped.
 
-            if since and since_reached:
-                prev_commit = curr_commit
+    Diffs larger than `size_limit` are split at line boundaries, parts are
+    yielded with their `offset`, thus line numbers are kept.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> log = [
+    ...     "\x1ec2\x1fc1\x1fUser <user@example.com>\x1f2021-01-02\x1fFix\n",
+    ...     "\x1f",
+    ...     "",
+    ...     "diff --git a/a.py b/a.py",
+    ...     "--- a/a.py",
+    ...     "+++ b/a.py",
+    ...     "@@ -1 +1 @@",
+    ...     "-old",
+    ...     "+new",
+    ...     "\x1ec1\x1f\x1fUser <user@example.com>\x1f2021-01-01\x1fInit\n",
+    ...     "\x1f",
+    ...     "",
+    ...     "diff --git a/b.bin b/b.bin",
+    ...     "Binary files /dev/null and b/b.bin differ",
+    ...     "diff --git a/a.py b/a.py",
+    ...     "--- /dev/null",
+    ...     "+++ b/a.py",
+    ...     "@@ -0,0 +1 @@",
+    ...     "+old",
+    ... ]
+    >>> for f in _patchiter(log, {"c2": {"main"}}):
+    ...     print(f.commit, f.branch, f.message, f.path, repr(f.read()))
+    c2 main Fix a.py '@@ -1 +1 @@\n-old\n+new'
+    c1 main Init a.py '@@ -0,0 +1 @@\n+old'
+
+    Paths with spaces and special characters
+
+    >>> quoted = [
+    ...     "\x1ec3\x1f\x1fUser <user@example.com>\x1f2021-01-03\x1fAdd\n",
+    ...     "\x1f",
+    ...     "",
+    ...     "diff --git a/sp ace.txt b/sp ace.txt",
+    ...     "+++ b/sp ace.txt\t",
+    ...     "@@ -0,0 +1 @@",
+    ...     "+new",
+    ...     'diff --git "a/q\\"uote.txt" "b/q\\"uote.txt"',
+    ...     '+++ "b/q\\"uote.txt"',
+    ...     "@@ -0,0 +1 @@",
+    ...     "+new",
+    ... ]
+    >>> [f.path for f in _patchiter(quoted, {})]
+    ['sp ace.txt', 'q"uote.txt']
+
+    Split large diffs
+
+    >>> for f in _patchiter(log, {"c2": {"main"}}, size_limit=16):
+    ...     print(f.commit, f.path, f.offset, repr(f.read()))
+    c2 a.py 0 '@@ -1 +1 @@\n-old'
+    c2 a.py 2 '+new'
+    c1 a.py 0 '@@ -0,0 +1 @@\n+old'
+
+    """
+    exclude_set = DEFAULT_EXCLUDE_SET | set(exclude or [])
+    # branches containing commits, which are not reached yet
+    pending: Dict[str, Set[str]] = {}
+    header: List[str] = []
+    meta = None
+    fpath, content, offset, size = None, None, 0, 0
+
+    for line in itertools.chain(lines, ["\x1e"]):
+        new_commit = not header and line.startswith("\x1e")
+        boundary = new_commit or line.startswith("diff --")
+        if content and (boundary or size >= size_limit):
+            yield File(
+                path=fpath,
+                meta=meta,
+                content="\n".join(content),
+                offset=offset,
+            )
+            offset += len(content)
+            content, size = [], 0
+
+        if header or new_commit:
+            fpath, content = None, None
+            header.append(line)
+            raw = "\n".join(header)
+            if raw.count("\x1f") < 5:
                 continue
 
-            diff_id = str(prev_commit) + str(curr_commit)
-            if not prev_commit or diff_id in already_searched:
-                prev_commit = curr_commit
+            header = []
+            sha, parents, author, date, message, _ = raw[1:].split("\x1f")
+            branches = tips.get(sha, set()) | pending.pop(sha, set())
+            for parent in parents.split():
+                pending.setdefault(parent, set()).update(branches)
+
+            # shared by all diffs of the commit and their issues
+            meta = Commit(
+                id=sha,
+                branch=", ".join(sorted(branches)),
+                message=message.strip(),
+                author=author,
+                date=date,
+            )
+        elif boundary:
+            fpath, content = None, None
+        elif content is not None:
+            content.append(line)
+            size += len(line) + 1
+        elif line.startswith("+++ "):
+            fpath = _diffpath(line)
+            if fpath is None:
                 continue
+            pattern = _match(fpath, exclude_set)
+            if pattern:
+                log.debug(f"skipping diff '{fpath}': '{pattern}'")
+                fpath = None
+                if metrics is not None:
+                    metrics.skipped += 1
+            elif metrics is not None:
+                metrics.diffs += 1
+        elif fpath and line.startswith("@@"):
+            content, offset, size = [line], 0, len(line) + 1
+
+
+def _diffpath(line: str) -> Optional[str]:
+    r"""Return new file path of `+++` diff header, `None` if file is removed.
+
+    Note
+    ----
+    Git appends tab to names with spaces and C-quotes names with special
+    characters even if `core.quotepath` is off.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> _diffpath("+++ b/a.py")
+    'a.py'
+    >>> _diffpath("+++ b/sp ace.txt\t")
+    'sp ace.txt'
+    >>> _diffpath('+++ "b/q\\"uote\\tname.txt"')
+    'q"uote\tname.txt'
+    >>> _diffpath('+++ "b/\\303\\274.txt"')
+    'ü.txt'
+    >>> _diffpath("+++ /dev/null") is None
+    True
 
-            diff = prev_commit.diff(curr_commit, create_patch=True)
-            already_searched.add(diff_id)
-            yield from _diffiter(diff, prev_commit, branch, exclude)
-            prev_commit = curr_commit
+    """
+    path = line[4:]
+    if path.startswith('"') and path.endswith('"') and len(path) > 1:
+        raw = QUOTED_RE.sub(_unescape, path[1:-1].encode())
+        path = raw.decode("utf-8", "replace")
+    elif path.endswith("\t"):
+        path = path[:-1]
+
+    return path[2:] if path.startswith("b/") else None
+
+
+def _unescape(match: re.Match) -> bytes:
+    escape = match.group(1)
+    if len(escape) == 3:
+        return bytes([int(escape, 8) & 0xFF])
+    return QUOTED_ESCAPES.get(escape, escape)
+
+
+def _gitlines(path: str, *args: str) -> Iterator[str]:
+    """Run Git command in path and yield its output lines as they arrive."""
+    with subprocess.Popen(
+        ["git", "-c", "core.quotepath=off", *args],
+        cwd=path,
+        stdout=subprocess.PIPE,
+        encoding="utf-8",
+        errors="replace",
+    ) as proc:
+        try:
+            for line in proc.stdout:
+                yield line.rstrip("\n")
+        except GeneratorExit:
+            # consumer stopped early, e.g. in fail-fast mode
+            proc.kill()
+            raise
 
-        diff = curr_commit.diff(git.NULL_TREE, create_patch=True)
-        yield from _diffiter(diff, prev_commit, branch, exclude)
+    if proc.returncode:  # pragma: no cover
+        log.warning(f"git {args[0]} exited with code {proc.returncode}")
 
 
-def _diffiter(
-    diff: git.DiffIndex,
-    commit: git.Commit,
-    branch: git.Head,
+def stagediter(
+    path: str,
     exclude: Iterable[str] = None,
+    metrics: Metrics = None,
 ) -> Iterator[File]:
-    r"""Iterate over commit blobs and yield diffs for each file.
+    """Iterate over staged changes and yield added lines of each hunk.
 
     Note
     ----
-    Blobs with change type "D" (delete) and "R" (rename) are skipped.
+    Git is called directly instead of using GitPython to keep this fast
+    enough for pre-commit hooks. Each hunk is yielded with its `offset`,
+    so that issues are reported with line numbers of the staged file.
+
+    """
+    try:
+        patch = _git(
+            path,
+            "diff",
+            "--cached",
+            "--no-color",
+            "--no-ext-diff",
+            "--unified=0",
+            "--diff-filter=ACMR",
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        log.warning(f"reading staged changes: {e}")
+        return
+
+    exclude_set = DEFAULT_EXCLUDE_SET | set(exclude or [])
+    for fpath, offset, lines in _hunks(patch):
+        pattern = _match(fpath, exclude_set)
+        if pattern:
+            log.debug(f"skipping staged '{fpath}': '{pattern}'")
+            if metrics is not None:
+                metrics.skipped += 1
+            continue
+
+        if metrics is not None:
+            metrics.diffs += 1
+
+        yield File(path=fpath, content="\n".join(lines), offset=offset)
+
+
+def streamiter(
+    stream: TextIO,
+    path: str = STREAM_PATH,
+    size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[File]:
+    r"""Read stream in chunks and yield them split at line boundaries.
+
+    Note
+    ----
+    Incomplete last line of each chunk is carried over to the next one.
+    Lines longer than `size` are split, so that memory usage stays bounded.
+    Chunks are yielded with their `offset` in stream lines.
 
     Examples
     --------
     Basic usage examples
 
-    >>> repo = git.Repo()
-    >>> b1 = b"\x87\x02\xc5\x00p\xf8\x84\x04\xd5bLJ\xec\xe69\xba\x85\xf1V\x81"
-    >>> b2 = b"o\xac\x8e\xf5\x88\x8e/\xacM\x0cd^\xcd\xc0\xb1\x9dY$`\x80"
-    >>> c1 = git.Commit(repo, b1)
-    >>> c2 = git.Commit(repo, b2)
-    >>> diff = c1.diff(c2, create_patch=True)
-    >>> branch = _get_branches(repo, "master")[0]
-    >>> len(list(_diffiter(diff, c1, branch, ["tests/*"])))
-    6
+    >>> import io
+    >>> stream = io.StringIO("first\nsecond\nthird")
+    >>> for f in streamiter(stream, size=8):
+    ...     print(f.offset, repr(f.read()))
+    0 'first\n'
+    1 'second\n'
+    2 'third'
 
     """
-    exclude_set = DEFAULT_EXCLUDE_SET | set(exclude or [])
-    for blob in diff:
-        if blob.deleted_file or blob.renamed_file:  # pragma: no cover
-            continue
+    offset = 0
+    carry = ""
+    while True:
+        data = stream.read(size)
+        if not data:
+            break
 
-        pdiff = blob.diff.decode("utf-8", errors="replace")
-        fpath = blob.b_path if blob.b_path else blob.a_path
+        data = carry + data
+        end = data.rfind("\n") + 1 or len(data)
+        chunk, carry = data[:end], data[end:]
+        yield File(path=path, content=chunk, offset=offset)
+        offset += chunk.count("\n")
 
-        if pdiff.startswith("Binary files"):  # pragma: no cover
-            continue
+    if carry:
+        yield File(path=path, content=carry, offset=offset)
 
-        pattern = _match(fpath, exclude_set)
-        if pattern:
-            log.debug(f"skipping diff '{fpath}': '{pattern}'")
-            continue
 
-        yield File(
-            path=fpath,
-            content=pdiff,
-            branch=branch.name.split("/")[-1],
-            message=commit.message.strip(),
-            author=f"{commit.author.name} <{commit.author.email}>",
-            commit=commit.hexsha,
-            date=commit.committed_datetime.isoformat(),
+def archiveiter(
+    path: str,
+    exclude: Iterable[str] = None,
+    depth: int = ARCHIVE_DEPTH,
+    metrics: Metrics = None,
+    name: str = None,
+) -> Iterator[File]:
+    r"""Iterate over archive members and yield them without extraction.
+
+    Note
+    ----
+    Zip and tar archives are supported, including compressed tarballs.
+    Nested archives are searched up to `depth` levels. Members are reported
+    as `archive!/inner/path` and matched against `exclude` by inner path.
+    Binary members and members larger than `ARCHIVE_MEMBER_SIZE` are skipped.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> buf = io.BytesIO()
+    >>> with zipfile.ZipFile(buf, "w") as z:
+    ...     z.writestr("conf/app.properties", "key=value")
+    ...     z.writestr("lib/data.bin", b"\xff\xfe")
+    >>> inner = buf.getvalue()
+    >>> with zipfile.ZipFile(buf, "w") as z:
+    ...     z.writestr("lib/inner.jar", inner)
+    ...     z.writestr("README.md", "readme")
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(suffix=".zip") as f:
+    ...     _ = f.write(buf.getvalue())
+    ...     f.flush()
+    ...     files = list(archiveiter(f.name, ["*.md"], name="app.zip"))
+    >>> [f.path for f in files]
+    ['app.zip!/lib/inner.jar!/conf/app.properties']
+
+    """
+    exclude_set = DEFAULT_EXCLUDE_SET | set(exclude or [])
+    with open(path, "rb") as f:
+        yield from _memberiter(
+            f, name or Path(path).as_posix(), exclude_set, depth, metrics
         )
 
 
+def isarchive(path: str) -> bool:
+    """Check whether file looks like supported archive by its magic bytes.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> isarchive("README.md")
+    False
+
+    """
+    try:
+        with open(path, "rb") as f:
+            return _isarchive(f.read(512))
+    except OSError:  # pragma: no cover
+        return False
+
+
+def shardof(file: File, count: int) -> int:
+    """Return 1-based index of the shard file belongs to out of `count`.
+
+    Note
+    ----
+    Shard depends on file path and Git commit only, thus it is the same for
+    all processes and machines scanning the same repository. All parts of a
+    split diff belong to the same shard.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> shardof(File("a.py"), 4) == shardof(File("a.py", content="x"), 4)
+    True
+    >>> sorted({shardof(File(f"{i}.py"), 3) for i in range(30)})
+    [1, 2, 3]
+
+    """
+    key = f"{file.commit or ''}:{file.path}".encode()
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def _isarchive(head: bytes) -> bool:
+    return any(head[i : i + len(m)] == m for i, m in ARCHIVE_MAGIC)
+
+
+def _memberiter(
+    fileobj: BinaryIO,
+    name: str,
+    exclude_set: Iterable[str],
+    depth: int,
+    metrics: Metrics = None,
+) -> Iterator[File]:
+    """Yield archive members, recursing into nested archives."""
+    try:
+        for member, data in _members(fileobj):
+            mpath = f"{name}{ARCHIVE_SEP}{member}"
+            pattern = _match(member, exclude_set)
+            if pattern:
+                log.debug(f"skipping member '{mpath}': '{pattern}'")
+                if metrics is not None:
+                    metrics.skipped += 1
+                continue
+
+            if data is None:
+                log.warning(f"skipping member '{mpath}': too large")
+                continue
+
+            if depth > 0 and _isarchive(data[:512]):
+                yield from _memberiter(
+                    io.BytesIO(data), mpath, exclude_set, depth - 1, metrics
+                )
+                continue
+
+            try:
+                content = data.decode()
+            except UnicodeDecodeError:
+                log.debug(f"skipping binary member '{mpath}'")
+                continue
+
+            if metrics is not None:
+                metrics.files += 1
+
+            yield File(path=mpath, content=content)
+    except Exception as e:  # pragma: no cover
+        log.warning(f"skipping archive '{name}': {e}")
+
+
+def _members(fileobj: BinaryIO) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """Yield names and contents of archive members, None if too large."""
+    if zipfile.is_zipfile(fileobj):
+        with zipfile.ZipFile(fileobj) as z:
+            for info in z.infolist():
+                if not info.is_dir():
+                    with z.open(info) as m:
+                        yield info.filename, _readmember(m)
+        return
+
+    fileobj.seek(0)
+    with tarfile.open(fileobj=fileobj, mode="r:*") as t:
+        for info in t:
+            if info.isfile():
+                yield info.name, _readmember(t.extractfile(info))
+
+
+def _readmember(m: BinaryIO) -> Optional[bytes]:
+    # sizes declared in archive headers cannot be trusted
+    data = m.read(ARCHIVE_MEMBER_SIZE + 1)
+    return None if len(data) > ARCHIVE_MEMBER_SIZE else data
+
+
+def _hunks(patch: str) -> Iterator[Tuple[str, int, List[str]]]:
+    r"""Parse unified diff and yield path, offset and added lines of hunks.
+
+    Note
+    ----
+    Hunks without added lines and binary files are skipped.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> patch = "\n".join([
+    ...     "diff --git a/a.py b/a.py",
+    ...     "--- a/a.py",
+    ...     "+++ b/a.py",
+    ...     "@@ -1 +1,2 @@",
+    ...     "-old",
+    ...     "+new",
+    ...     "++++ not a header",
+    ...     "@@ -9,0 +11 @@ def f():",
+    ...     "+last",
+    ...     "diff --git a/b.bin b/b.bin",
+    ...     "Binary files a/b.bin and b/b.bin differ",
+    ... ])
+    >>> for h in _hunks(patch):
+    ...     print(h)
+    ('a.py', 0, ['new', '+++ not a header'])
+    ('a.py', 10, ['last'])
+
+    Paths with spaces and special characters
+
+    >>> patch = "\n".join([
+    ...     "diff --git a/two words.txt b/two words.txt",
+    ...     "+++ b/two words.txt\t",
+    ...     "@@ -0,0 +1 @@",
+    ...     "+new",
+    ...     'diff --git "a/q\\"uote.txt" "b/q\\"uote.txt"',
+    ...     '+++ "b/q\\"uote.txt"',
+    ...     "@@ -0,0 +1 @@",
+    ...     "+new",
+    ... ])
+    >>> [h[0] for h in _hunks(patch)]
+    ['two words.txt', 'q"uote.txt']
+
+    """
+    fpath, offset, lines = None, 0, []
+    header = False
+    for line in patch.splitlines():
+        if line.startswith("diff --git "):
+            if lines:
+                yield fpath, offset, lines
+            fpath, lines, header = None, [], True
+        elif header and line.startswith("+++ "):
+            fpath = _diffpath(line)
+        elif line.startswith("@@ "):
+            if lines:
+                yield fpath, offset, lines
+            match = HUNK_RE.match(line)
+            offset, lines, header = int(match.group(1)) - 1, [], False
+        elif not header and fpath and line.startswith("+"):
+            lines.append(line[1:])
+
+    if lines:
+        yield fpath, offset, lines
+
+
 def _get_branches(
-    repo: git.Repo, branch: str = None
-) -> Iterable[git.Commit]:  # pragma: no cover
+    repo: "git.Repo", branch: str = None
+) -> Iterable["git.Commit"]:  # pragma: no cover
     """Return a list of repository branches.
 
     Try to fetch branches from remote first.
@@ -218,6 +891,25 @@ def _get_branches(
     return [repo.branches[branch] if branch else repo.active_branch]
 
 
+def _is_repo(path: str) -> bool:
+    """Check whether path looks like Git repository without importing Git.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> _is_repo(".")
+    True
+    >>> _is_repo("trufflehog3")
+    False
+
+    """
+    if os.environ.get("GIT_DIR"):  # pragma: no cover
+        return True
+
+    return any(os.path.exists(os.path.join(path, p)) for p in (".git", "HEAD"))
+
+
 def _match(path: str, patterns: Iterable[str] = None) -> Optional[str]:
     """Match path against given glob patterns and return matched pattern if any.
 
@@ -239,14 +931,49 @@ def _match(path: str, patterns: Iterable[str] = None) -> Optional[str]:
     True
     >>> _match(".git/hooks/update.sample", [".git/**/*"])
     '.git/**/*'
+    >>> _match("./conf/app.yml", ["conf/*.yml"])
+    'conf/*.yml'
+
+    Trailing slash is ignored, like `pathlib` does
+
+    >>> _match("node_modules", ["node_modules/"])
+    'node_modules/'
+    >>> _match("build", ["build/"])
+    'build/'
+    >>> _match("src/vendor", ["**/vendor/"])
+    '**/vendor/'
+
+    Pattern is normalised as well
+
+    >>> _match("conf/app.yml", ["./conf/*.yml"])
+    './conf/*.yml'
+    >>> _match("README.md", ["./*"])
+    './*'
+    >>> _match("a/b", ["a//b"])
+    'a//b'
 
     """
     if not patterns:
         return None
 
-    fpath = Path(path)
+    # same semantics as `Path.full_match`, but avoids creating `Path` objects
+    # and compiling patterns for every file, which is slow for huge trees
+    fpath = path if isinstance(path, str) else Path(path).as_posix()
+    if "./" in fpath or "//" in fpath or fpath.endswith("/"):
+        fpath = Path(fpath).as_posix()
+
     for glob in patterns:
-        if fpath.full_match(glob):
+        if _compile(glob).match(fpath):
             return glob
 
     return None
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(pattern: str) -> re.Pattern:
+    """Compile glob pattern to regular expression."""
+    # normalise like `pathlib` does, e.g. `./conf/*.yml` or `node_modules/`
+    pattern = PurePosixPath(pattern).as_posix()
+    return re.compile(
+        globlib.translate(pattern, recursive=True, include_hidden=True)
+    )
@@ -0,0 +1,332 @@
+"""Scan statistics collected by worker processes and merged by parent."""
+
+import attr
+import json as jsonlib
+
+from typing import Dict, List, Optional
+
+from trufflehog3 import __NAME__
+from trufflehog3.models import File, Model
+
+PROMETHEUS_PREFIX = __NAME__
+
+
+@attr.s
+class RuleStats(Model):
+    """RuleStats holds profiling data of a single rule.
+
+    Attributes
+    ----------
+    id (str)
+    : Rule ID. Stats of rules sharing the same ID are aggregated.
+
+    time (float)
+    : Wall time spent in `findall`, in seconds.
+
+    lines (int)
+    : Number of lines evaluated.
+
+    bytes (int)
+    : Number of characters evaluated.
+
+    matches (int)
+    : Number of raw matches.
+
+    excluded (int)
+    : Number of matches dropped by exclude rules.
+
+    """
+
+    id: str = attr.ib()
+    time: float = attr.ib(0.0)
+    lines: int = attr.ib(0)
+    bytes: int = attr.ib(0)
+    matches: int = attr.ib(0)
+    excluded: int = attr.ib(0)
+
+    def merge(self, other: "RuleStats"):
+        """Add other stats to this one."""
+        self.time += other.time
+        self.lines += other.lines
+        self.bytes += other.bytes
+        self.matches += other.matches
+        self.excluded += other.excluded
+
+
+class Profile(Dict[str, RuleStats]):
+    """Profile maps rule IDs to their stats.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> p1 = Profile()
+    >>> p1.rule("rule-1").matches += 1
+    >>> p2 = Profile()
+    >>> p2.rule("rule-1").matches += 2
+    >>> p2.rule("rule-2").lines += 1
+    >>> p1.merge(p2)
+    >>> p1["rule-1"].matches
+    3
+    >>> sorted(p1)
+    ['rule-1', 'rule-2']
+
+    """
+
+    def rule(self, id: str) -> RuleStats:
+        """Return stats for the given rule ID, creating them if necessary."""
+        stats = self.get(id)
+        if stats is None:
+            stats = self[id] = RuleStats(id)
+        return stats
+
+    def merge(self, other: "Profile"):
+        """Add other profile to this one."""
+        for id, stats in other.items():
+            self.rule(id).merge(stats)
+
+    def sorted(self):
+        """Return rule stats sorted by time spent, slowest first."""
+        return sorted(self.values(), key=lambda s: (-s.time, s.id))
+
+    def json(self) -> str:
+        """Render profile as JSON.
+
+        Examples
+        --------
+        Basic usage examples
+
+        >>> p = Profile()
+        >>> p.rule("rule-1").lines += 1
+        >>> print(p.json())
+        [
+          {
+            "id": "rule-1",
+            "time": 0.0,
+            "lines": 1,
+            "bytes": 0,
+            "matches": 0,
+            "excluded": 0
+          }
+        ]
+
+        """
+        return jsonlib.dumps([s.asdict() for s in self.sorted()], indent=2)
+
+    def text(self) -> str:
+        """Render profile as table.
+
+        Examples
+        --------
+        Basic usage examples
+
+        >>> p = Profile()
+        >>> p.rule("rule-1").lines += 1
+        >>> print(p.text())
+        rule                         time     lines      bytes matches excluded
+        rule-1                     0.0000         1          0       0        0
+
+        """
+        header = ("rule", "time", "lines", "bytes", "matches", "excluded")
+        rows = ["%-24s %8s %9s %10s %7s %8s" % header]
+        for s in self.sorted():
+            rows.append(
+                "%-24s %8.4f %9d %10d %7d %8d"
+                % (s.id, s.time, s.lines, s.bytes, s.matches, s.excluded)
+            )
+
+        return "\n".join(rows)
+
+
+@attr.s
+class Metrics(Model):
+    """Metrics holds counters and timings of scan pipeline stages.
+
+    Attributes
+    ----------
+    files (int)
+    : Number of files walked in current tree.
+
+    skipped (int)
+    : Number of files, directories and diffs skipped by exclude rules.
+
+    diffs (int)
+    : Number of diffs produced from Git history.
+
+    bytes (int)
+    : Number of characters read and searched.
+
+    lines (int)
+    : Number of lines scanned.
+
+    matches (int)
+    : Number of raw rule matches.
+
+    excluded (int)
+    : Number of matches dropped by exclude rules.
+
+    suppressed (int)
+    : Number of issues dropped by per rule per file limit.
+
+    issues (int)
+    : Number of unique issues emitted.
+
+    cached (int)
+    : Number of unchanged files whose findings were reused from cache.
+
+    entropy_hits (int)
+    : Number of entropy calculations served from memo cache.
+
+    entropy_misses (int)
+    : Number of entropy calculations not found in memo cache, long strings
+    are never memoized nor counted.
+
+    walk (float)
+    : Time spent walking current tree, in seconds.
+
+    diff (float)
+    : Time spent producing Git history diffs, in seconds.
+
+    search (float)
+    : Time spent searching by all workers, in seconds.
+
+    render (float)
+    : Time spent rendering report, in seconds.
+
+    """
+
+    files: int = attr.ib(0)
+    skipped: int = attr.ib(0)
+    diffs: int = attr.ib(0)
+    bytes: int = attr.ib(0)
+    lines: int = attr.ib(0)
+    matches: int = attr.ib(0)
+    excluded: int = attr.ib(0)
+    suppressed: int = attr.ib(0)
+    issues: int = attr.ib(0)
+    cached: int = attr.ib(0)
+    entropy_hits: int = attr.ib(0)
+    entropy_misses: int = attr.ib(0)
+    walk: float = attr.ib(0.0)
+    diff: float = attr.ib(0.0)
+    search: float = attr.ib(0.0)
+    render: float = attr.ib(0.0)
+
+    def merge(self, other: "Metrics"):
+        """Add other metrics to these ones.
+
+        Examples
+        --------
+        Basic usage examples
+
+        >>> m = Metrics(lines=1, search=0.5)
+        >>> m.merge(Metrics(lines=2, search=0.25))
+        >>> m.lines, m.search
+        (3, 0.75)
+
+        """
+        for field in attr.fields(Metrics):
+            value = getattr(self, field.name) + getattr(other, field.name)
+            setattr(self, field.name, value)
+
+    def json(self) -> str:
+        """Render metrics as JSON."""
+        return jsonlib.dumps(self.asdict(), indent=2)
+
+    def prometheus(self) -> str:
+        r"""Render metrics in Prometheus text exposition format.
+
+        Examples
+        --------
+        Basic usage examples
+
+        >>> print("\n".join(Metrics(files=3).prometheus().splitlines()[:3]))
+        # HELP trufflehog3_files_total Number of files walked in current tree.
+        # TYPE trufflehog3_files_total counter
+        trufflehog3_files_total 3
+
+        """
+        rows = []
+        for field in attr.fields(Metrics):
+            if field.type is float:
+                name = f"{PROMETHEUS_PREFIX}_{field.name}_seconds"
+                kind = "gauge"
+            else:
+                name = f"{PROMETHEUS_PREFIX}_{field.name}_total"
+                kind = "counter"
+
+            rows.append(f"# HELP {name} {_describe(field.name)}")
+            rows.append(f"# TYPE {name} {kind}")
+            rows.append(f"{name} {getattr(self, field.name)}")
+
+        return "\n".join(rows) + "\n"
+
+
+@attr.s
+class Coverage(Model):
+    """Coverage records paths and Git commits which were searched.
+
+    Attributes
+    ----------
+    target (str)
+    : Scan target.
+
+    complete (bool)
+    : Whether all files and diffs were searched.
+
+    paths (List[str])
+    : Searched paths of current tree, archive members and staged changes.
+
+    commits (List[str])
+    : Commits all diffs of which were searched, newest first.
+
+    partial (str, optional)
+    : Commit only some diffs of which were searched.
+
+    Examples
+    --------
+    Basic usage examples
+
+    >>> from trufflehog3.models import Commit
+    >>> coverage = Coverage("repo")
+    >>> coverage.add(File("a.py"))
+    >>> c1 = Commit("c1")
+    >>> coverage.add(File("b.py", meta=c1))
+    >>> coverage.add(File("c.py", meta=c1))
+    >>> coverage.stop(File("d.py", meta=c1))
+    >>> coverage.paths, coverage.commits, coverage.partial
+    (['a.py'], [], 'c1')
+
+    """
+
+    target: str = attr.ib()
+    complete: bool = attr.ib(True)
+    paths: List[str] = attr.ib(factory=list)
+    commits: List[str] = attr.ib(factory=list)
+    partial: Optional[str] = attr.ib(None)
+
+    def add(self, file: File):
+        """Record file or diff passed on for searching."""
+        if file.commit is None:
+            if not self.paths or self.paths[-1] != file.path:
+                self.paths.append(file.path)
+        elif not self.commits or self.commits[-1] != file.commit:
+            self.commits.append(file.commit)
+
+    def stop(self, file: File = None):
+        """Record that scan has stopped before the given file or diff."""
+        self.complete = False
+        if file is None:
+            return
+        if file.commit is not None and self.commits[-1:] == [file.commit]:
+            self.partial = self.commits.pop()
+
+
+def _describe(name: str) -> str:
+    """Return metric description from `Metrics` docstring."""
+    lines = Metrics.__doc__.splitlines()
+    for i, line in enumerate(lines):
+        if line.strip().startswith(f"{name} ("):
+            return lines[i + 1].strip(" :")
+
+    return name  # pragma: no cover